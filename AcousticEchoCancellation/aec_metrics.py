@@ -0,0 +1,128 @@
+"""
+@FileName: aec_metrics.py
+@Description: Implement running ERLE, ERL, residual echo and double talk statistics for AEC
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import numpy as np
+from scipy import signal
+
+
+class AECMetrics:
+    def __init__(self, lambda_p=0.999, decimation=160, eps=1e-10):
+        """
+        :param lambda_p: forgetting factor of the recursive power estimates
+        :param decimation: keep one point of the time series every decimation samples
+        :param eps: floor of the power estimates
+        """
+        self.lambda_p = lambda_p
+        self.decimation = decimation
+        self.eps = eps
+        self.b = [1 - lambda_p]
+        self.a = [1, -lambda_p]
+
+        # 递归平滑的功率, 每个样本 O(1)
+        self.powerX = 0.0                     # far-end power
+        self.powerD = 0.0                     # microphone power
+        self.powerE = 0.0                     # residual (error) power
+        self.rateDT = 0.0                     # smoothed double talk decision rate
+        self.double_talk = 0                  # number of samples flagged as double talk
+        self.n = 0                            # number of processed samples
+        self.has_far = False
+
+        self.history = {"index": [], "ERLE": [], "ERL": [], "residual": [], "double_talk": []}
+
+    def _smooth(self, v, prev):
+        """
+        first order recursive smoothing of a whole block
+        :param v: block of instantaneous values
+        :param prev: last smoothed value of the previous block
+        :return: smoothed block
+        """
+        y, _ = signal.lfilter(self.b, self.a, v, zi=[self.lambda_p * prev])
+        return y
+
+    def update(self, near, error, far=None, double_talk=None):
+        """
+        update the statistics with one block, any block length is allowed
+        :param near: microphone block
+        :param error: canceller output block
+        :param far: far-end block, needed for ERL
+        :param double_talk: per-sample or per-block double talk decision
+        :return:
+        """
+        near = np.asarray(near, dtype=np.float64)
+        error = np.asarray(error, dtype=np.float64)
+        N = len(near)
+        if N == 0:
+            return
+
+        pd = self._smooth(near * near, self.powerD)
+        pe = self._smooth(error * error, self.powerE)
+        self.powerD, self.powerE = pd[-1], pe[-1]
+
+        if far is not None:
+            far = np.asarray(far, dtype=np.float64)
+            px = self._smooth(far * far, self.powerX)
+            self.powerX = px[-1]
+            self.has_far = True
+        else:
+            px = None
+
+        if double_talk is not None:
+            dt = np.broadcast_to(np.asarray(double_talk, dtype=np.float64), (N,))
+            rate = self._smooth(dt, self.rateDT)
+            self.rateDT = rate[-1]
+            self.double_talk += int(np.sum(dt))
+        else:
+            rate = None
+
+        # 抽取时间序列
+        idx = np.arange((-self.n) % self.decimation, N, self.decimation)
+        if len(idx):
+            self.history["index"].append(self.n + idx)
+            self.history["ERLE"].append(10 * np.log10((pd[idx] + self.eps) / (pe[idx] + self.eps)))
+            self.history["residual"].append(10 * np.log10(pe[idx] + self.eps))
+            if px is not None:
+                self.history["ERL"].append(10 * np.log10((px[idx] + self.eps) / (pd[idx] + self.eps)))
+            if rate is not None:
+                self.history["double_talk"].append(rate[idx])
+        self.n += N
+
+    @property
+    def ERLE(self):
+        return 10 * np.log10((self.powerD + self.eps) / (self.powerE + self.eps))
+
+    @property
+    def ERL(self):
+        return 10 * np.log10((self.powerX + self.eps) / (self.powerD + self.eps))
+
+    @property
+    def residual(self):
+        return 10 * np.log10(self.powerE + self.eps)
+
+    @property
+    def double_talk_rate(self):
+        return self.double_talk / max(self.n, 1)
+
+    def series(self):
+        """
+        decimated time series collected so far
+        :return: dict of arrays keyed by index, ERLE, ERL, residual and double_talk
+        """
+        return {k: np.concatenate(v) if len(v) else np.zeros(0) for k, v in self.history.items()}
+
+    def summary(self):
+        """
+        current values of the statistics
+        :return: dict of scalars
+        """
+        result = {"samples": self.n, "ERLE": self.ERLE, "residual": self.residual,
+                  "double_talk_rate": self.double_talk_rate}
+        if self.has_far:
+            result["ERL"] = self.ERL
+        return result
@@ -0,0 +1,202 @@
+"""
+@FileName: benchmark.py
+@Description: Implement an AEC benchmark on synthetic echo paths, double talk and echo path changes
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import csv
+import time
+import tracemalloc
+import numpy as np
+import soundfile as sf
+
+root = os.path.dirname(os.path.abspath(__file__))
+for folder in ["lms", "kalman", "subband", os.path.join("..", "WebRTC_AEC")]:
+    sys.path.append(os.path.join(root, folder))
+from aec_metrics import AECMetrics
+from StreamingLMS import StreamingLMS
+from PBFDAF import PBFDAF
+from FDKF import FDKF
+from kalman import diagonalKalman
+from SubbandAEC import SubbandAEC
+from APA import APA
+
+FIELDS = ["scenario", "engine", "rtf", "peak_mem_mb", "erle_db", "erle_dt_db", "convergence_s"]
+
+
+def syntheticPath(length=512, delay=40, rt60=0.06, gain=0.5, sr=16000, seed=0):
+    """
+    exponentially decaying random room response
+    :param length: response length in samples, including the bulk delay
+    :param delay: bulk delay in samples
+    :param rt60: time for the envelope to decay by 60 dB in seconds
+    :param gain: l2 norm of the response
+    :return: impulse response
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(length - delay) / sr
+    h = np.zeros(length)
+    h[delay:] = rng.standard_normal(length - delay) * np.exp(-6.9 * t / rt60)
+    return gain * h / np.linalg.norm(h)
+
+
+def makeScenarios(far, sr=16000, L=512, noise_db=-45.0, seed=0):
+    """
+    deterministic test pairs built from one far-end recording
+    the near-end talker is the time-reversed far-end signal, so it is speech-like but uncorrelated with the echo
+    :param far: far-end signal
+    :param L: echo path length in samples
+    :param noise_db: microphone noise level relative to the echo
+    :return: dict of name -> (far, near, echo, near speech + noise, double talk mask,
+             index from which convergence is measured)
+    """
+    N = len(far)
+    rng = np.random.default_rng(seed)
+    h1 = syntheticPath(L, 40, sr=sr, seed=seed + 1)
+    h2 = syntheticPath(L, 96, sr=sr, seed=seed + 2)
+
+    echo = np.convolve(far, h1)[:N]
+    echo_power = np.mean(echo ** 2)
+    noise = np.sqrt(echo_power * 10 ** (noise_db / 10)) * rng.standard_normal(N)
+
+    # 双讲段放在第三个四分之一, 最后四分之一用于稳态 ERLE
+    speech = np.zeros(N)
+    talk = np.zeros(N, dtype=bool)
+    talk[N // 2:3 * N // 4] = True
+    talker = far[::-1][talk]
+    speech[talk] = talker * np.sqrt(echo_power / (np.mean(talker ** 2) + 1e-12))
+    no_talk = np.zeros(N, dtype=bool)
+
+    # 后半段换成另一条回声路径
+    changed = echo.copy()
+    changed[N // 2:] = np.convolve(far, h2)[N // 2:N]
+
+    return {
+        "single_talk": (far, echo + noise, echo, noise, no_talk, 0),
+        "double_talk": (far, echo + speech + noise, echo, speech + noise, talk, 0),
+        "path_change": (far, changed + noise, changed, noise, no_talk, N // 2),
+    }
+
+
+def makeEngines(sr=16000, L=512):
+    """
+    every canceller as far, near -> echo cancelled signal aligned with near
+    """
+    def streaming(aec, far, near, block_size=160):
+        e = np.zeros(len(near))
+        for k in range(0, len(near), block_size):
+            e[k:k + block_size] = aec.process(far[k:k + block_size], near[k:k + block_size])
+        return e
+
+    def kalman(far, near):
+        # e[i] 对应 near[i+L], 前 L 个样本不做消除
+        return np.concatenate([near[:L], diagonalKalman(far, near, L)])
+
+    engines = {
+        "LMS": lambda far, near: streaming(StreamingLMS(L=L, mu=0.014), far, near),
+        "NLMS": lambda far, near: streaming(StreamingLMS(L=L, mu=0.5, normalized=True), far, near),
+        "PBFDAF": lambda far, near: PBFDAF(L=L, block_size=128).run(far, near)[0],
+        "FDKF": lambda far, near: FDKF(L=L).run(far, near)[0],
+        "Kalman": kalman,
+        "Subband": lambda far, near: SubbandAEC(L=L).run(far, near),
+        "APA": lambda far, near: APA(L=L, P=4).process(far, near),
+    }
+
+    try:
+        from webrtc_aec import WebRtcAec
+        WebRtcAec(sr).close()
+        engines["WebRTC"] = lambda far, near: WebRtcAec(sr).processFile(far, near).astype(np.float64)
+    except Exception as err:
+        print("WebRTC AEC skipped: %s" % err, file=sys.stderr)
+    return engines
+
+
+def run(engine, far, near):
+    """
+    :return: output padded with the unprocessed microphone signal to len(near), wall time in seconds
+    """
+    far32, near32 = far.astype(np.float32), near.astype(np.float32)
+    start = time.perf_counter()
+    e = engine(far32, near32)
+    elapsed = time.perf_counter() - start
+    n = min(len(e), len(near))
+    return np.concatenate([e[:n], near[n:]]), elapsed
+
+
+def peakMemory(engine, far, near):
+    """
+    peak Python/NumPy heap allocated while running one engine, in MB
+    """
+    tracemalloc.start()
+    engine(far.astype(np.float32), near.astype(np.float32))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def evaluate(e, echo, others, talk, start, sr=16000, target=10.0, decimation=160):
+    """
+    ERLE against the known echo, the residual echo is e minus near speech and noise
+    :return: steady-state ERLE, ERLE during double talk, seconds from start to target dB, -1 if never reached
+             after an echo path change the clock stops when ERLE is back above target after its first dip
+    """
+    residual = e - others
+    N = len(e)
+    tail = slice(3 * N // 4, N)
+    erle = 10 * np.log10(np.sum(echo[tail] ** 2) / (np.sum(residual[tail] ** 2) + 1e-12))
+    erle_dt = np.nan
+    if np.any(talk):
+        erle_dt = 10 * np.log10(np.sum(echo[talk] ** 2) / (np.sum(residual[talk] ** 2) + 1e-12))
+
+    metrics = AECMetrics(decimation=decimation)
+    metrics.update(echo, residual)
+    series = metrics.series()
+    after = series["index"] >= start
+    if start > 0:
+        dips = np.nonzero(after & (series["ERLE"] < target))[0]
+        if len(dips):
+            after &= series["index"] >= series["index"][dips[0]]
+    hits = np.nonzero(after & (series["ERLE"] >= target))[0]
+    convergence = (series["index"][hits[0]] - start) / sr if len(hits) else -1.0
+    return erle, erle_dt, convergence
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 8.0
+    output_path = sys.argv[2] if len(sys.argv) > 2 else "./aec_benchmark.csv"
+
+    far, sr = sf.read(os.path.join(root, "samples", "far.wav"))
+    # 跳过开头的静音, 收敛时间从远端开始说话算起
+    onset = int(np.argmax(np.abs(far) > 0.01 * np.max(np.abs(far))))
+    far = far[onset:onset + int(seconds * sr)]
+    L = 512
+
+    scenarios = makeScenarios(far, sr, L)
+    engines = makeEngines(sr, L)
+
+    rows = []
+    for engine_name, engine in engines.items():
+        # tracemalloc 会拖慢 Python 循环, 内存单独跑一遍
+        x, d = scenarios["single_talk"][:2]
+        peak = peakMemory(engine, x, d)
+        for scenario_name, (x, d, echo, others, talk, start) in scenarios.items():
+            e, elapsed = run(engine, x, d)
+            erle, erle_dt, convergence = evaluate(e, echo, others, talk, start, sr)
+            rows.append({"scenario": scenario_name, "engine": engine_name, "rtf": "%.4f" % (elapsed / (len(d) / sr)),
+                         "peak_mem_mb": "%.2f" % peak, "erle_db": "%.2f" % erle, "erle_dt_db": "%.2f" % erle_dt,
+                         "convergence_s": "%.3f" % convergence})
+        print("%s done" % engine_name, file=sys.stderr)
+
+    writer = csv.DictWriter(sys.stdout, FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
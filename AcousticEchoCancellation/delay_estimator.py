@@ -0,0 +1,196 @@
+"""
+@FileName: delay_estimator.py
+@Description: Implement binary spectrum bulk delay estimation and reference alignment for AEC,
+              following WebRTC_AEC/src/delay_estimator.c
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import numpy as np
+
+# 每个字节中 1 的个数, 用于 32 位二值谱的汉明距离
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int32)
+
+
+def bitCount(values):
+    """
+    number of set bits of every uint32 value
+    :param values: uint32 array
+    :return: int array
+    """
+    values = np.ascontiguousarray(values, dtype=np.uint32)
+    return POPCOUNT[values.view(np.uint8)].reshape(-1, 4).sum(axis=1)
+
+
+class BinarySpectrum:
+    def __init__(self, band_first=12, band_last=43, scale=1 / 64.0):
+        """
+        convert a magnitude spectrum to 32 bits, one bit per band above its running mean
+        :param band_first: first band used
+        :param band_last: last band used, band_last - band_first < 32
+        :param scale: smoothing factor of the threshold spectrum
+        """
+        self.band_first = band_first
+        self.band_last = band_last
+        self.scale = scale
+        self.weights = (1 << np.arange(band_last - band_first + 1)).astype(np.uint32)
+        self.threshold = None
+
+    def __call__(self, spectrum):
+        spectrum = spectrum[self.band_first:self.band_last + 1]
+        if self.threshold is None:
+            if not np.any(spectrum > 0):
+                return np.uint32(0)
+            # 初始阈值取输入谱的一半, 加快收敛
+            self.threshold = spectrum / 2
+        self.threshold = self.threshold + (spectrum - self.threshold) * self.scale
+        return np.uint32(np.sum(self.weights[spectrum > self.threshold]))
+
+
+class DelayEstimator:
+    # 以下常量与 delay_estimator.c 一致, 由 Q9 换算为浮点
+    probability_offset = 2.0
+    probability_lower_limit = 17.0
+    probability_min_spread = 5.5
+    shifts_at_zero = 13
+    shifts_linear_slope = 3
+
+    def __init__(self, block_size=64, max_delay=8000):
+        """
+        :param block_size: samples per block, the spectrum is a 2*block_size FFT
+        :param max_delay: largest delay to search in samples
+        """
+        self.block_size = block_size
+        self.history_size = int(np.ceil(max_delay / block_size)) + 1
+        self.window = np.sqrt(np.hanning(2 * block_size + 1)[:-1])
+
+        self.far_binary = BinarySpectrum()
+        self.near_binary = BinarySpectrum()
+        self.far_old = np.zeros(block_size)
+        self.near_old = np.zeros(block_size)
+
+        # 远端二值谱历史, 下标 i 即延时 i 块
+        self.binary_far_history = np.zeros(self.history_size, dtype=np.uint32)
+        self.far_bit_counts = np.zeros(self.history_size, dtype=np.int32)
+        self.mean_bit_counts = 20.0 * np.ones(self.history_size)
+        self.minimum_probability = 32.0
+        self.last_delay_probability = 32.0
+        self.last_delay = -1
+
+    def spectrum(self, old, block):
+        return np.abs(np.fft.rfft(self.window * np.concatenate([old, block])))
+
+    def process(self, far_block, near_block):
+        """
+        update the estimate with one block
+        :param far_block: far-end block of block_size samples
+        :param near_block: microphone block of block_size samples
+        :return: delay in blocks, -1 until a reliable estimate is found
+        """
+        far_block = np.asarray(far_block, dtype=np.float64)
+        near_block = np.asarray(near_block, dtype=np.float64)
+        binary_far = self.far_binary(self.spectrum(self.far_old, far_block))
+        binary_near = self.near_binary(self.spectrum(self.near_old, near_block))
+        self.far_old, self.near_old = far_block, near_block
+
+        # 远端历史右移一位, 插入当前块
+        self.binary_far_history[1:] = self.binary_far_history[:-1]
+        self.binary_far_history[0] = binary_far
+        self.far_bit_counts[1:] = self.far_bit_counts[:-1]
+        self.far_bit_counts[0] = bitCount(np.array([binary_far]))[0]
+
+        # 与所有延时的远端二值谱比较, 只在远端有能量时更新均值
+        bit_counts = bitCount(np.bitwise_xor(self.binary_far_history, binary_near))
+        active = self.far_bit_counts > 0
+        shifts = self.shifts_at_zero - ((self.shifts_linear_slope * self.far_bit_counts) >> 4)
+        self.mean_bit_counts[active] += (bit_counts[active] - self.mean_bit_counts[active]) / (2.0 ** shifts[active])
+
+        candidate_delay = int(np.argmin(self.mean_bit_counts))
+        value_best_candidate = self.mean_bit_counts[candidate_delay]
+        valley_depth = np.max(self.mean_bit_counts) - value_best_candidate
+
+        # 更新自适应门限
+        if self.minimum_probability > self.probability_lower_limit and valley_depth > self.probability_min_spread:
+            threshold = max(value_best_candidate + self.probability_offset, self.probability_lower_limit)
+            self.minimum_probability = min(self.minimum_probability, threshold)
+
+        # 马尔可夫式缓慢上升
+        self.last_delay_probability += 1.0 / 512
+        valid_candidate = valley_depth > self.probability_offset and \
+            (value_best_candidate < self.minimum_probability or value_best_candidate < self.last_delay_probability)
+
+        if valid_candidate:
+            self.last_delay = candidate_delay
+            self.last_delay_probability = min(self.last_delay_probability, value_best_candidate)
+        return self.last_delay
+
+
+class DelayAligner:
+    def __init__(self, block_size=64, max_delay=8000, margin=32, taps=None):
+        """
+        delay the far-end signal by the estimated bulk delay so the adaptive filter only models the echo tail
+        the estimate is rounded to whole blocks, so the delay left to the filter is margin +- block_size / 2
+        :param block_size: samples per block
+        :param max_delay: largest delay to compensate in samples
+        :param margin: samples of delay left to the adaptive filter, at least block_size / 2 to keep the echo causal,
+                       a small fraction of the filter length such as L // 4
+        :param taps: length of the adaptive filter behind the aligner, checks that margin plus one block fits in it
+        """
+        if taps is not None and margin + block_size >= taps:
+            raise ValueError("margin + block_size (%d) must be smaller than the filter length %d"
+                             % (margin + block_size, taps))
+        self.block_size = block_size
+        self.margin = margin
+        self.estimator = DelayEstimator(block_size, max_delay)
+        self.delay = 0                                          # 当前补偿的延时 (样本)
+
+        # 远端环形缓冲, 每个样本写两次以便取连续切片
+        self.size = self.estimator.history_size * block_size + block_size
+        self.buffer = np.zeros(2 * self.size)
+        self.pos = 0
+
+    def process(self, far_block, near_block):
+        """
+        align one block of the far-end signal
+        :param far_block: far-end block of block_size samples
+        :param near_block: microphone block of block_size samples
+        :return: far-end block delayed by the current delay estimate
+        """
+        N = self.block_size
+        pos = self.pos
+        self.buffer[pos:pos + N] = far_block
+        self.buffer[pos + self.size:pos + self.size + N] = far_block
+        self.pos = (pos + N) % self.size
+
+        delay = self.estimator.process(far_block, near_block)
+        if delay >= 0:
+            target = max(delay * N - self.margin, 0)
+            # 只在偏差超过余量一半时才跳变, 避免频繁打乱滤波器
+            if abs(target - self.delay) > self.margin // 2:
+                self.delay = target
+
+        start = (pos - self.delay) % self.size
+        return self.buffer[start:start + N].copy()
+
+
+def alignReference(far, near, block_size=64, max_delay=8000, margin=32, taps=None):
+    """
+    align a whole far-end signal to the microphone signal block by block
+    :param far: far-end signal
+    :param near: microphone signal
+    :param margin: samples of delay left to the adaptive filter, see DelayAligner
+    :param taps: length of the adaptive filter behind the aligner
+    :return: aligned far-end signal, per-block compensated delay in samples
+    """
+    aligner = DelayAligner(block_size, max_delay, margin, taps)
+    frame_num = min(len(far), len(near)) // block_size
+    aligned = np.zeros(len(far))
+    delays = np.zeros(frame_num, dtype=np.int64)
+    for i in range(frame_num):
+        k = i * block_size
+        aligned[k:k + block_size] = aligner.process(far[k:k + block_size], near[k:k + block_size])
+        delays[i] = aligner.delay
+    return aligned, delays
@@ -0,0 +1,253 @@
+"""
+@FileName: dtd.py
+@Description: Implement block-wise double talk detectors (NCC, Geigel, coherence) for AEC
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import numpy as np
+from scipy import signal
+from scipy.ndimage import maximum_filter1d
+
+
+class CrossSpectra:
+    def __init__(self, nfft=2048, alpha=0.85, hop=None):
+        """
+        recursively smoothed far/near auto and cross spectra over the last nfft samples
+        the window must be longer than the echo path, otherwise most of the echo in the near window comes from
+        far-end samples outside the far window and the two look uncorrelated even in single talk
+        :param nfft: analysis length, windows of consecutive updates overlap by nfft - hop
+        :param alpha: smoothing factor across updates
+        :param hop: recompute the spectra once every hop samples, None for every block
+        """
+        self.nfft = nfft
+        self.alpha = alpha
+        self.hop = hop
+        self.pending = 0
+        self.far_pending = []
+        self.near_pending = []
+        self.window = np.hanning(nfft + 1)[:-1]
+        self.far_history = np.zeros(nfft)
+        self.near_history = np.zeros(nfft)
+        self.Sxd = np.zeros(nfft // 2 + 1, dtype=np.complex128)
+        self.Sxx = np.zeros(nfft // 2 + 1)
+        self.Sdd = np.zeros(nfft // 2 + 1)
+
+    def update(self, far, near):
+        """
+        :param far: far-end block
+        :param near: microphone block
+        :return: True if the spectra were recomputed
+        """
+        # 窗口每次只移动一个块, 攒够 hop 个样本再移动历史并做 FFT
+        self.far_pending.append(np.array(far, dtype=np.float64))
+        self.near_pending.append(np.array(near, dtype=np.float64))
+        self.pending += len(near)
+        if self.hop is not None and self.pending < self.hop:
+            return False
+        for history, pending in ((self.far_history, self.far_pending), (self.near_history, self.near_pending)):
+            block = np.concatenate(pending)[-self.nfft:]
+            N = len(block)
+            history[:self.nfft - N] = history[N:]
+            history[self.nfft - N:] = block
+            pending.clear()
+        self.pending = 0
+        X = np.fft.rfft(self.window * self.far_history)
+        D = np.fft.rfft(self.window * self.near_history)
+
+        a = self.alpha
+        self.Sxd *= a
+        self.Sxd += (1 - a) * X * np.conj(D)
+        self.Sxx *= a
+        self.Sxx += (1 - a) * (X.real ** 2 + X.imag ** 2)
+        self.Sdd *= a
+        self.Sdd += (1 - a) * (D.real ** 2 + D.imag ** 2)
+        return True
+
+
+class NCCDetector:
+    def __init__(self, T=0.9, lambda_DTD=0.95, DTDbegin=20000, nfft=2048, alpha=0.6, hop=512, onset=10.0,
+                 release=3072, legacy=False):
+        """
+        normalized cross-correlation detector (Benesty et al. 2000), xi = sqrt(r_xd' (var_d R_x)^-1 r_xd)
+        evaluated in the frequency domain as sqrt(sum |Sxd|^2 / Sxx / sum Sdd), one value per spectra update
+        xi is close to 1 in single talk whatever the state of the adaptive filter and drops with near-end speech
+        the spectra span nfft samples and register near-end speech only 50-100 ms after it starts, so the a priori
+        error is checked as well: a residual far above its single talk level freezes the filter at once
+        :param T: double talk detection threshold
+        :param lambda_DTD: DTD update factor of the legacy statistic
+        :param DTDbegin: sample index where DTD starts working, the filter always adapts before it
+        :param nfft: far/near window length, at least the echo path length, see CrossSpectra
+        :param alpha: smoothing factor of the spectra across updates, 0.6 per 512 samples is 0.85 per 160-sample block
+        :param hop: spectra update interval in samples, the two 2048-point FFTs per block cost as much as PBFDAF
+        :param onset: freeze while the block residual power exceeds onset times its single talk level (and -10 dB
+                      of the microphone power), None to use xi alone
+        :param release: samples of high residual with xi above T after which the new residual level is accepted,
+                        an echo path change raises the residual without lowering xi
+        :param legacy: use the per-sample statistic of LMS.py, 1 - r_em^2 / var_d, smoothed with lfilter
+                       it is not normalized by the error power and stays close to 1 during double talk
+        """
+        self.T = T
+        self.lambda_DTD = lambda_DTD
+        self.DTDbegin = DTDbegin
+        self.legacy = legacy
+        self.onset = onset
+        self.release = release
+        self.uses_error = legacy or onset is not None
+        self.b = [1 - lambda_DTD]
+        self.a = [1, -lambda_DTD]
+        self.r_em = 0.0
+        self.varMIC2 = 0.0
+        self.spectra = CrossSpectra(nfft, alpha, hop)
+        self.xi = 0.0
+        self.residual = None                    # 单讲时先验误差与近端的能量比
+        self.clear = 0
+        self.n = 0
+        self.statistic = np.zeros(0)
+
+    def _residualCheck(self, near, error, started, single_talk):
+        """
+        freeze at the onset of double talk, before xi has dropped
+        :param near: microphone block
+        :param error: a priori error block
+        :param started: the block starts after DTDbegin
+        :param single_talk: xi is above T
+        :return: False to freeze the filter for the block
+        """
+        ratio = np.dot(error, error) / (np.dot(near, near) + 1e-12)
+        if self.residual is None or not started:
+            self.residual = ratio if self.residual is None else 0.9 * self.residual + 0.1 * ratio
+            return True
+
+        high = ratio > max(self.onset * self.residual, 0.1)
+        # 残差一直偏高而 xi 一直判为单讲, 是回声路径变化, 接受新的残差水平
+        self.clear = self.clear + len(near) if high and single_talk else 0
+        if high and self.clear >= self.release:
+            self.residual, self.clear, high = ratio, 0, False
+        if high:
+            return False
+        if single_talk:
+            self.residual = 0.9 * self.residual + 0.1 * ratio
+        return True
+
+    def process(self, far, near, error=None):
+        """
+        :param far: far-end block
+        :param near: microphone block
+        :param error: a priori error block, used by the legacy statistic and the onset check, may be None otherwise
+        :return: per-sample adapt mask
+        """
+        near = np.asarray(near, dtype=np.float64)
+        N = len(near)
+        index = self.n + np.arange(N)
+        active = index >= self.DTDbegin
+        self.n += N
+
+        if self.legacy:
+            # DTDbegin 之前的样本不参与统计
+            error = np.asarray(error, dtype=np.float64)
+            v = np.where(active, np.stack([error * near, near * near]), 0.0)
+            zi = self.lambda_DTD * np.array([[self.r_em], [self.varMIC2]])
+            (r_em, var2), _ = signal.lfilter(self.b, self.a, v, zi=zi)
+            if N:
+                self.r_em, self.varMIC2 = r_em[-1], var2[-1]
+            self.statistic = 1 - r_em ** 2 / (var2 + 1e-12)
+        else:
+            spectra = self.spectra
+            if N and spectra.update(far, near):
+                Sxd2 = spectra.Sxd.real ** 2 + spectra.Sxd.imag ** 2
+                self.xi = np.sqrt(np.sum(Sxd2 / (spectra.Sxx + 1e-12)) / (np.sum(spectra.Sdd) + 1e-12))
+            self.statistic = np.full(N, self.xi)
+
+        self.statistic[~active] = 0.0
+        adapt = ~active | (self.statistic > self.T)
+        if not self.legacy and self.onset is not None and error is not None and N:
+            error = np.asarray(error, dtype=np.float64)
+            if not self._residualCheck(near, error, active[0], self.xi > self.T):
+                adapt[:] = False
+        return adapt
+
+
+class GeigelDetector:
+    def __init__(self, threshold=0.5, L=128, hangover=240):
+        """
+        Geigel detector, double talk if |near| >= threshold * max |far| over the last L samples
+        :param threshold: ratio, 0.5 is the classic -6 dB
+        :param L: far-end window length, usually the filter length
+        :param hangover: samples the filter stays frozen after a detection, the detecting sample is always frozen
+        """
+        self.threshold = threshold
+        self.L = L
+        self.hangover = hangover
+        self.uses_error = False
+        self.far_history = np.zeros(L - 1)
+        self.last_detection = -np.inf
+        self.n = 0
+        self.statistic = np.zeros(0)
+
+    def process(self, far, near, error=None):
+        """
+        :param far: far-end block
+        :param near: microphone block
+        :param error: unused
+        :return: per-sample adapt mask
+        """
+        far = np.abs(np.asarray(far, dtype=np.float64))
+        near = np.abs(np.asarray(near, dtype=np.float64))
+        N = len(near)
+        L = self.L
+
+        # 滑动最大值, 窗口为当前样本及之前的 L-1 个样本
+        seq = np.concatenate([self.far_history, far])
+        far_max = maximum_filter1d(seq, size=L, origin=(L - 1) // 2)[L - 1:] if N else np.zeros(0)
+        self.far_history = seq[len(seq) - (L - 1):]
+
+        self.statistic = near / (far_max + 1e-12)
+        detected = near >= self.threshold * far_max
+
+        # hangover: 检测到的样本及其后 hangover 个样本内都冻结
+        index = self.n + np.arange(N)
+        last = np.maximum.accumulate(np.where(detected, index, -np.inf)) if N else np.zeros(0)
+        last = np.maximum(last, self.last_detection)
+        if N:
+            self.last_detection = last[-1]
+        self.n += N
+        return index - last > self.hangover
+
+
+class CoherenceDetector:
+    def __init__(self, threshold=0.75, nfft=2048, alpha=0.85, band=(300, 3400), sr=16000):
+        """
+        coherence detector, near-end speech lowers the far/near coherence
+        :param threshold: mean coherence below which double talk is declared
+        :param nfft: far/near window length, at least the echo path length, see CrossSpectra
+        :param alpha: smoothing factor of the cross and auto spectra across blocks
+        :param band: frequency range (Hz) the coherence is averaged over
+        :param sr: sample rate
+        """
+        self.threshold = threshold
+        self.uses_error = False
+        self.spectra = CrossSpectra(nfft, alpha)
+        freqs = np.fft.rfftfreq(nfft, 1.0 / sr)
+        self.band = (freqs >= band[0]) & (freqs <= band[1])
+        self.statistic = np.zeros(0)
+
+    def process(self, far, near, error=None):
+        """
+        :param far: far-end block
+        :param near: microphone block
+        :param error: unused
+        :return: per-sample adapt mask, constant over the block
+        """
+        N = len(near)
+        spectra = self.spectra
+        if N:
+            spectra.update(far, near)
+        b = self.band
+        coherence = np.abs(spectra.Sxd[b]) ** 2 / (spectra.Sxx[b] * spectra.Sdd[b] + 1e-12)
+        value = np.mean(coherence)
+        self.statistic = np.full(N, value)
+        return np.full(N, value >= self.threshold)
@@ -0,0 +1,64 @@
+"""
+@FileName: echo_path_state.py
+@Description: Save and restore converged AEC filter states per device for warm start
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import numpy as np
+
+
+def statePath(device_id, engine, state_dir="./aec_state"):
+    """
+    state file of one device and one canceller
+    :param device_id: device identifier
+    :param engine: canceller name, e.g. lms, kalman, fdkf
+    :param state_dir: directory of the state files
+    :return: path of the state file
+    """
+    return os.path.join(state_dir, "%s_%s.npz" % (engine, device_id))
+
+
+def saveState(path, state):
+    """
+    save a canceller state, the file is replaced atomically
+    :param path: state file path
+    :param state: dict of arrays / scalars
+    :return:
+    """
+    state_dir = os.path.dirname(path)
+    if state_dir:
+        os.makedirs(state_dir, exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **state)
+    os.replace(tmp_path, path)
+
+
+def loadState(path):
+    """
+    load a canceller state
+    :param path: state file path
+    :return: dict of arrays, None if there is no saved state
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
+
+
+def checkShape(state, key, shape):
+    """
+    make sure a saved array matches the canceller configuration
+    :param state: loaded state
+    :param key: array name
+    :param shape: expected shape
+    :return: the array
+    """
+    value = np.asarray(state[key])
+    if value.shape != tuple(shape):
+        raise ValueError("saved %s has shape %s, expected %s" % (key, value.shape, tuple(shape)))
+    return value
@@ -0,0 +1,292 @@
+"""
+@FileName: FDKF.py
+@Description: Implement frequency-domain kalman filter AEC
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import librosa
+import soundfile as sf
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from aec_metrics import AECMetrics
+from echo_path_state import statePath, saveState, loadState, checkShape
+
+
+class MisadjustmentTracker:
+    def __init__(self, bins, refs=1, gamma=0.95, mics=None):
+        """
+        per-bin misadjustment of the echo path, |Sxe|^2 / Sxx^2 from the smoothed far/error spectra
+        near-end speech and noise are uncorrelated with the far end, so only the misadjusted echo survives,
+        after subtracting the bias of the finite average of uncorrelated signals
+        :param bins: frequency bins
+        :param refs: far-end reference channels, each one is tracked on its own
+        :param gamma: smoothing factor across blocks
+        :param mics: microphone channels, None for a single microphone without a channel axis
+        """
+        shape = (bins, refs) if mics is None else (mics, bins, refs)
+        self.gamma = gamma
+        self.Sxe = np.zeros(shape, dtype=np.complex128)
+        self.Sxx = np.zeros((bins, refs))
+        self.See = np.zeros(shape[:-1])
+        self.n = 0
+
+    def update(self, X, E):
+        """
+        :param X: far-end spectrum, shape (bins, refs)
+        :param E: error spectrum, shape (bins,) or (mics, bins)
+        :return: misadjustment power, same shape as Sxe
+        """
+        g = self.gamma
+        self.Sxe = g * self.Sxe + (1 - g) * np.conj(X) * E[..., None]
+        self.Sxx = g * self.Sxx + (1 - g) * np.abs(X) ** 2
+        self.See = g * self.See + (1 - g) * np.abs(E) ** 2
+
+        # 指数平均的偏差 (1-g)/(1+g), 前几块平均的帧数少, 偏差更大
+        self.n += 1
+        gn = g ** self.n
+        bias = (1 - g) / (1 + g) * (1 + gn) / (1 - gn)
+        cross = np.abs(self.Sxe) ** 2 - bias * self.Sxx * self.See[..., None]
+        return np.maximum(cross, 0) / (self.Sxx ** 2 + 1e-12)
+
+
+class FDKF:
+    def __init__(self, L=256, A=0.999, beta=0.5, P_init=1.0, eps=1e-6, gamma=0.95):
+        """
+        :param L: filter length, also the block size of the 2*L FFT
+        :param A: state transition factor of the echo path random walk
+        :param beta: smoothing factor of the observation noise estimate
+        :param P_init: initial state covariance
+        :param eps: regularization of the innovation covariance
+        :param gamma: smoothing factor of the far/error spectra that measure the misadjustment after a path change
+        """
+        self.L = L
+        self.A2 = A * A
+        self.beta = beta
+        self.eps = eps
+        self.gamma = gamma
+
+        bins = L + 1
+        self.W = np.zeros(bins, dtype=np.complex128)      # 频域回声路径
+        self.P = P_init * np.ones(bins)                     # 每个频点的状态协方差 (对角)
+        self.Phi_ss = np.zeros(bins)                        # 观测噪声功率谱
+        self.x_old = np.zeros(L)                            # 上一块远端信号
+        self.tracker = MisadjustmentTracker(bins, 1, gamma)
+
+    def process(self, far_block, near_block):
+        """
+        cancel echo for one block of L samples
+        :param far_block: far-end block
+        :param near_block: microphone block
+        :return: echo cancelled block, echo estimate block
+        """
+        L = self.L
+        X = np.fft.rfft(np.concatenate([self.x_old, far_block]))
+        self.x_old = np.asarray(far_block, dtype=np.float64)
+
+        # 预测
+        y = np.fft.irfft(X * self.W, 2 * L)[L:]
+        e = near_block - y
+        E = np.fft.rfft(np.concatenate([np.zeros(L), e]))
+
+        # 回声路径变化后误差与远端相关, 协方差不能小于测得的失调
+        X2 = np.abs(X) ** 2
+        self.P = np.maximum(self.P, self.tracker.update(X[:, None], E)[:, 0])
+
+        # 卡尔曼增益
+        self.Phi_ss = self.beta * self.Phi_ss + (1 - self.beta) * np.abs(E) ** 2
+        K = self.P * np.conj(X) / (X2 * self.P + self.Phi_ss + self.eps)
+
+        # 更新回声路径并做梯度约束
+        w = np.fft.irfft(self.W + K * E, 2 * L)
+        w[L:] = 0
+        self.W = np.fft.rfft(w)
+
+        # 更新状态协方差, 0.5 为重叠带来的 L/2L
+        self.P = self.A2 * (1 - 0.5 * np.real(K * X)) * self.P + (1 - self.A2) * np.abs(self.W) ** 2
+        return e, y
+
+    def getState(self):
+        """
+        converged echo path, state covariance and noise spectrum for warm start
+        :return: dict of arrays
+        """
+        return {"W": self.W, "P": self.P, "Phi_ss": self.Phi_ss}
+
+    def setState(self, state):
+        """
+        warm start from a saved state
+        :param state: dict returned by getState
+        :return:
+        """
+        self.W = checkShape(state, "W", self.W.shape).astype(np.complex128)
+        self.P = checkShape(state, "P", self.P.shape).astype(self.P.dtype)
+        self.Phi_ss = checkShape(state, "Phi_ss", self.Phi_ss.shape).astype(np.float64)
+
+    def run(self, far, near):
+        """
+        cancel echo for whole signals
+        :param far: far-end signal
+        :param near: microphone signal
+        :return: echo cancelled signal, echo estimate
+        """
+        L = self.L
+        frame_num = min(len(far), len(near)) // L
+        e = np.zeros(frame_num * L)
+        y = np.zeros(frame_num * L)
+        for i in range(frame_num):
+            k = i * L
+            e[k:k + L], y[k:k + L] = self.process(far[k:k + L], near[k:k + L])
+        return e, y
+
+
+class MultiFDKF:
+    def __init__(self, L=256, refs=2, mics=1, A=0.999, beta=0.5, P_init=1.0, eps=1e-6, gamma=0.95):
+        """
+        frequency-domain kalman AEC with K far-end references and M microphones
+        every microphone has a joint K-channel echo path state with a full KxK covariance per bin,
+        so correlated references (e.g. stereo) are handled jointly
+        :param L: filter length, also the block size of the 2*L FFT
+        :param refs: number of far-end reference channels K
+        :param mics: number of microphone channels M
+        :param A: state transition factor of the echo path random walk
+        :param beta: smoothing factor of the observation noise estimate
+        :param P_init: initial state covariance
+        :param eps: regularization of the innovation covariance
+        :param gamma: smoothing factor of the far/error spectra that measure the misadjustment after a path change
+        """
+        self.L = L
+        self.refs = refs
+        self.mics = mics
+        self.A2 = A * A
+        self.beta = beta
+        self.eps = eps
+        self.gamma = gamma
+
+        bins = L + 1
+        self.W = np.zeros((mics, bins, refs), dtype=np.complex128)                  # 每个麦克风的联合回声路径
+        self.P = P_init * np.tile(np.identity(refs, dtype=np.complex128), (mics, bins, 1, 1))
+        self.Phi_ss = np.zeros((mics, bins))                                         # 观测噪声功率谱
+        self.x_old = np.zeros((refs, L))                                             # 上一块远端信号
+        self.tracker = MisadjustmentTracker(bins, refs, gamma, mics)
+
+    def process(self, far_block, near_block):
+        """
+        cancel echo for one block of L samples
+        :param far_block: far-end block, shape (refs, L)
+        :param near_block: microphone block, shape (mics, L)
+        :return: echo cancelled block and echo estimate block, shape (mics, L)
+        """
+        L = self.L
+        far_block = np.asarray(far_block, dtype=np.float64).reshape(self.refs, L)
+        near_block = np.asarray(near_block, dtype=np.float64).reshape(self.mics, L)
+
+        # 所有参考信号只做一次 FFT, 所有麦克风共享
+        X = np.fft.rfft(np.concatenate([self.x_old, far_block], axis=1), axis=1).T     # (bins, refs)
+        self.x_old = far_block
+
+        # 预测
+        Y = np.einsum('mbk,bk->mb', self.W, X)
+        y = np.fft.irfft(Y, 2 * L, axis=1)[:, L:]
+        e = near_block - y
+        E = np.fft.rfft(np.concatenate([np.zeros((self.mics, L)), e], axis=1), axis=1)
+
+        # 回声路径变化后误差与远端相关, 每个参考通道的方差不能小于测得的失调, 只加对角保持半正定
+        diag = np.arange(self.refs)
+        misadjustment = self.tracker.update(X, E)
+        self.P[:, :, diag, diag] += np.maximum(misadjustment - np.real(self.P[:, :, diag, diag]), 0)
+
+        # 卡尔曼增益, 每个频点 K 维
+        PX = np.einsum('mbij,bj->mbi', self.P, np.conj(X))
+        Re = np.real(np.einsum('bi,mbi->mb', X, PX))
+        self.Phi_ss = self.beta * self.Phi_ss + (1 - self.beta) * np.abs(E) ** 2
+        K = PX / (Re + self.Phi_ss + self.eps)[:, :, None]
+
+        # 更新回声路径并做梯度约束
+        w = np.fft.irfft(self.W + K * E[:, :, None], 2 * L, axis=1)
+        w[:, L:] = 0
+        self.W = np.fft.rfft(w, axis=1)
+
+        # 更新状态协方差
+        XP = np.einsum('bi,mbij->mbj', X, self.P)
+        self.P = self.A2 * (self.P - 0.5 * K[:, :, :, None] * XP[:, :, None, :])
+        self.P[:, :, diag, diag] += (1 - self.A2) * np.abs(self.W) ** 2
+        return e, y
+
+    def getState(self):
+        """
+        converged echo path, state covariance and noise spectrum for warm start
+        :return: dict of arrays
+        """
+        return {"W": self.W, "P": self.P, "Phi_ss": self.Phi_ss}
+
+    def setState(self, state):
+        """
+        warm start from a saved state
+        :param state: dict returned by getState
+        :return:
+        """
+        self.W = checkShape(state, "W", self.W.shape).astype(np.complex128)
+        self.P = checkShape(state, "P", self.P.shape).astype(self.P.dtype)
+        self.Phi_ss = checkShape(state, "Phi_ss", self.Phi_ss.shape).astype(np.float64)
+
+    def run(self, far, near):
+        """
+        cancel echo for whole signals
+        :param far: far-end signals, shape (refs, samples)
+        :param near: microphone signals, shape (mics, samples)
+        :return: echo cancelled signals, echo estimates, shape (mics, samples)
+        """
+        L = self.L
+        far = np.atleast_2d(far)
+        near = np.atleast_2d(near)
+        frame_num = min(far.shape[1], near.shape[1]) // L
+        e = np.zeros((self.mics, frame_num * L))
+        y = np.zeros((self.mics, frame_num * L))
+        for i in range(frame_num):
+            k = i * L
+            e[:, k:k + L], y[:, k:k + L] = self.process(far[:, k:k + L], near[:, k:k + L])
+        return e, y
+
+
+if __name__ == "__main__":
+    # 多通道文件 (如立体声远端) 自动使用 MultiFDKF
+    far, sr = librosa.load("./far.wav", sr=16000, mono=False)
+    near, sr = librosa.load("./near.wav", sr=16000, mono=False)
+
+    if far.ndim == 1 and near.ndim == 1:
+        aec = FDKF(L=256)
+    else:
+        far, near = np.atleast_2d(far), np.atleast_2d(near)
+        aec = MultiFDKF(L=256, refs=far.shape[0], mics=near.shape[0])
+
+    # 从该设备上次收敛的回声路径开始
+    device = sys.argv[1] if len(sys.argv) > 1 else "default"
+    state_path = statePath(device, type(aec).__name__.lower())
+    state = loadState(state_path)
+    if state is not None:
+        aec.setState(state)
+
+    start = time.time()
+    e, y = aec.run(far, near)
+    end = time.time()
+
+    duration = e.shape[-1] / sr
+    print('Running time of FDKF: %s Seconds' % (end - start))
+    print('Real-time factor of FDKF: %.4f' % ((end - start) / duration))
+
+    n = e.shape[-1]
+    for m, (near_m, e_m) in enumerate(zip(np.atleast_2d(near), np.atleast_2d(e))):
+        metrics = AECMetrics(decimation=160)
+        metrics.update(near_m[:n], e_m)
+        print('mic %d:' % m, metrics.summary())
+
+    saveState(state_path, aec.getState())
+    sf.write("./fdkf_out.wav", e.T, sr)
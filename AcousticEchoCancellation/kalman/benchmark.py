@@ -0,0 +1,40 @@
+"""
+@FileName: benchmark.py
+@Description: Compare dense and diagonal-covariance time-domain kalman AEC
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import sys
+import time
+import librosa
+import numpy as np
+from kalman import denseKalman, diagonalKalman
+
+
+if __name__ == "__main__":
+    far, sr = librosa.load("./far.wav", sr=16000)
+    near, sr = librosa.load("./near.wav", sr=16000)
+
+    # 稠密版本很慢, 默认只取前 2 秒
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    N = int(seconds * sr)
+    far, near = far[:N], near[:N]
+    L = 256
+
+    start = time.time()
+    e_dense = denseKalman(far, near, L)
+    dense_time = time.time() - start
+
+    start = time.time()
+    e_diag = diagonalKalman(far, near, L)
+    diag_time = time.time() - start
+
+    duration = (N - L) / sr
+    print('Running time of dense kalman: %s Seconds, real-time factor %.4f' % (dense_time, dense_time / duration))
+    print('Running time of diagonal kalman: %s Seconds, real-time factor %.4f' % (diag_time, diag_time / duration))
+    print('Speedup: %.1fx' % (dense_time / diag_time))
+    print('Max abs output difference: %e' % np.max(np.abs(e_dense - e_diag)))
@@ -7,56 +7,152 @@
 @LastEditors: Please set LastEditors
 @Version: v0.1
 """
+import os
+import sys
 import numpy as np
 import librosa
 from tqdm import tqdm
 import soundfile as sf
 
-far, sr = librosa.load("./far.wav", sr=16000)
-near, sr = librosa.load("./near.wav", sr=16000)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from aec_metrics import AECMetrics
+from echo_path_state import statePath, saveState, loadState, checkShape
+from delay_estimator import alignReference
 
-L = 256
-P = 1
-delta = 0.0001
-w_cov = 0.01
-v_conv = 0.1
-sigma_e = 0.001
-sigma_x = 0.001
-alpha = 0.9
-lambda_v = 0.999
 
-h = np.zeros((L, 1))
-h_hat = np.zeros((L, 1))
+def initState(L, delta=0.0001, w_cov=0.01, v_conv=0.1, sigma_e=0.001, sigma_x=0.001):
+    """
+    initial kalman state, the covariance is stored as its diagonal
+    :param L: filter length
+    :return: state dict
+    """
+    return {"h_hat": np.zeros(L), "rmu": delta * np.ones(L), "Rex": 1e-3 * np.ones(L),
+            "w_cov": w_cov, "v_conv": v_conv, "sigma_e": sigma_e, "sigma_x": sigma_x}
 
-IL = np.identity(L)
-IP = np.identity(P)
 
-Rm = np.zeros((L, L))
-Rmu = delta * IL
-Rex = 1e-3 * np.ones((L, 1))
+def checkState(state, L):
+    """
+    validate a saved kalman state against the filter length
+    :param state: state dict
+    :param L: filter length
+    :return: state dict with float arrays / scalars
+    """
+    checked = {k: checkShape(state, k, (L,)).astype(np.float64) for k in ["h_hat", "rmu", "Rex"]}
+    for k in ["w_cov", "v_conv", "sigma_e", "sigma_x"]:
+        checked[k] = float(np.asarray(state[k]).reshape(-1)[0])
+    return checked
 
-frame_num = len(far) // L
 
-e = np.zeros(len(far))
-for i in tqdm(range(len(far) - L)):
-    X = np.expand_dims(far[i:i+L], axis=1)
-    Rm = Rmu + w_cov * IL
-    Re = X.T @ Rm @ X + v_conv * IP
-    K = Rm @ X / (Re + 0.03)
-    e[i] = near[i+L] - X.T @ h_hat
-    h_old = h_hat
-    h_hat = h_hat + K * e[i]
-    Rmu = (IL - K @ X.T) * Rm
-    delat_h = h_hat - h_old
-    w_cov = alpha * w_cov + (1 - alpha) * (delat_h.T @ delat_h)
-    Rex = lambda_v * Rex + (1 - lambda_v) * X * e[i]
-    sigma_x = lambda_v * sigma_x + (1 - lambda_v) * X[-1] * X[-1]
-    sigma_e = lambda_v * sigma_e + (1 - lambda_v) * e[i] * e[i]
-    v_conv = sigma_e - (1/(sigma_x + 0.03) * (Rex.T @ Rex))
+def denseKalman(far, near, L=256, delta=0.0001, w_cov=0.01, v_conv=0.1, sigma_e=0.001, sigma_x=0.001,
+                alpha=0.9, lambda_v=0.999, state=None):
+    """
+    time-domain kalman AEC with full LxL covariance matrices
+    :param far: far-end signal
+    :param near: microphone signal
+    :param L: filter length
+    :param state: optional state dict to warm start from, updated in place with the final state
+    :return: error signal, e[i] corresponds to near[i+L]
+    """
+    P = 1
+    s = checkState(state, L) if state else initState(L, delta, w_cov, v_conv, sigma_e, sigma_x)
+    h_hat = np.expand_dims(s["h_hat"], axis=1)
+    w_cov, v_conv, sigma_e, sigma_x = s["w_cov"], s["v_conv"], s["sigma_e"], s["sigma_x"]
 
-sf.write("./kalman_out.wav", e, sr)
+    IL = np.identity(L)
+    IP = np.identity(P)
 
+    Rm = np.zeros((L, L))
+    Rmu = np.diag(s["rmu"])
+    Rex = np.expand_dims(s["Rex"], axis=1)
 
+    e = np.zeros(len(far))
+    for i in tqdm(range(len(far) - L)):
+        X = np.expand_dims(far[i:i+L], axis=1)
+        Rm = Rmu + w_cov * IL
+        Re = X.T @ Rm @ X + v_conv * IP
+        K = Rm @ X / (Re + 0.03)
+        e[i] = near[i+L] - (X.T @ h_hat)[0, 0]
+        h_old = h_hat
+        h_hat = h_hat + K * e[i]
+        Rmu = (IL - K @ X.T) * Rm
+        delat_h = h_hat - h_old
+        w_cov = alpha * w_cov + (1 - alpha) * (delat_h.T @ delat_h)
+        Rex = lambda_v * Rex + (1 - lambda_v) * X * e[i]
+        sigma_x = lambda_v * sigma_x + (1 - lambda_v) * X[-1] * X[-1]
+        sigma_e = lambda_v * sigma_e + (1 - lambda_v) * e[i] * e[i]
+        v_conv = sigma_e - (1/(sigma_x + 0.03) * (Rex.T @ Rex))
 
+    if state is not None:
+        state.update(checkState({"h_hat": h_hat[:, 0], "rmu": np.diag(Rmu), "Rex": Rex[:, 0], "w_cov": w_cov,
+                                 "v_conv": v_conv, "sigma_e": sigma_e, "sigma_x": sigma_x}, L))
+    return e
 
 
+def diagonalKalman(far, near, L=256, delta=0.0001, w_cov=0.01, v_conv=0.1, sigma_e=0.001, sigma_x=0.001,
+                   alpha=0.9, lambda_v=0.999, state=None):
+    """
+    time-domain kalman AEC keeping only the covariance diagonal
+    (IL - K @ X.T) * Rm is elementwise, so Rm stays diagonal and the result equals denseKalman with O(L) work
+    :param far: far-end signal
+    :param near: microphone signal
+    :param L: filter length
+    :param state: optional state dict to warm start from, updated in place with the final state
+    :return: error signal, e[i] corresponds to near[i+L]
+    """
+    far = np.asarray(far, dtype=np.float64)
+    s = checkState(state, L) if state else initState(L, delta, w_cov, v_conv, sigma_e, sigma_x)
+    h_hat, rmu, Rex = s["h_hat"], s["rmu"], s["Rex"]          # rmu 即 diag(Rmu)
+    w_cov, v_conv, sigma_e, sigma_x = s["w_cov"], s["v_conv"], s["sigma_e"], s["sigma_x"]
+
+    # 滑动窗口的零拷贝视图, frames[i] 即 far[i:i+L]
+    frames = np.lib.stride_tricks.sliding_window_view(far, L)
+
+    e = np.zeros(len(far))
+    for i in tqdm(range(len(far) - L)):
+        X = frames[i]
+        rm = rmu + w_cov
+        Re = np.dot(rm * X, X) + v_conv
+        K = rm * X / (Re + 0.03)
+        err = near[i+L] - np.dot(X, h_hat)
+        e[i] = err
+        h_hat += K * err
+        rmu = (1 - K * X) * rm
+        w_cov = alpha * w_cov + (1 - alpha) * (err * err) * np.dot(K, K)
+        Rex *= lambda_v
+        Rex += (1 - lambda_v) * err * X
+        sigma_x = lambda_v * sigma_x + (1 - lambda_v) * X[-1] * X[-1]
+        sigma_e = lambda_v * sigma_e + (1 - lambda_v) * err * err
+        v_conv = sigma_e - np.dot(Rex, Rex) / (sigma_x + 0.03)
+
+    if state is not None:
+        state.update({"h_hat": h_hat, "rmu": rmu, "Rex": Rex, "w_cov": float(w_cov),
+                      "v_conv": float(v_conv), "sigma_e": float(sigma_e), "sigma_x": float(sigma_x)})
+    return e
+
+
+if __name__ == "__main__":
+    far, sr = librosa.load("./far.wav", sr=16000)
+    near, sr = librosa.load("./near.wav", sr=16000)
+
+    L = 256
+    align_delay = True          # 先估计并补偿整体延时, 滤波器只需建模回声尾部
+    mode = sys.argv[1] if len(sys.argv) > 1 else "dense"
+    device = sys.argv[2] if len(sys.argv) > 2 else "default"
+
+    # 从该设备上次收敛的状态开始, 结束后写回
+    state_path = statePath(device, "kalman")
+    state = loadState(state_path) or {}
+    if align_delay:
+        far = alignReference(far, near, margin=L // 4, taps=L)[0]
+    if mode == "diagonal":
+        e = diagonalKalman(far, near, L, state=state)
+    else:
+        e = denseKalman(far, near, L, state=state)
+    saveState(state_path, state)
+
+    # e[i] 对应 near[i+L]
+    metrics = AECMetrics(decimation=160)
+    metrics.update(near[L:], e[:len(far) - L], far[L:])
+    print(metrics.summary())
+
+    sf.write("./kalman_out.wav", e, sr)
@@ -0,0 +1,174 @@
+"""
+@FileName: APA.py
+@Description: Implement affine projection AEC with a sliding-window recursive inverse
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(root)
+sys.path.append(os.path.join(root, "kalman"))
+from aec_metrics import AECMetrics
+from StreamingLMS import StreamingLMS
+from kalman import diagonalKalman
+
+
+class APA:
+    def __init__(self, L=128, P=4, mu=0.5, delta=1e-3, refresh=1024):
+        """
+        :param L: filter length
+        :param P: projection order
+        :param mu: step size
+        :param delta: regularization added to the diagonal of X^T X
+        :param refresh: re-invert exactly every refresh samples to stop round-off accumulating
+        """
+        self.L = L
+        self.P = P
+        self.mu = mu
+        self.delta = delta
+        self.refresh = refresh
+
+        self.w = np.zeros(L)
+        # 参考与近端的环形缓冲, 每个样本写两次, 切片总是从新到旧的连续视图
+        self.size = L + P - 1
+        self.x_buffer = np.zeros(2 * self.size)
+        self.d_buffer = np.zeros(2 * P)
+        self.x_pos = 0
+        self.d_pos = 0
+        # 整个缓冲的滑动窗口视图只建一次, X 只需切片
+        self.frames = np.lib.stride_tricks.sliding_window_view(self.x_buffer, L)
+
+        # R = X^T X + delta * I 的逆, 两块缓冲交替使用, R[i, j] = x(n-i) . x(n-j) 本身不需要保存
+        self.R_inv = np.identity(P) / delta
+        self.R_inv_next = np.zeros((P, P))
+        self.U = np.zeros((2, max(P - 1, 0)))                 # 更新用的工作缓冲, 逐样本不再分配
+        self.V = np.zeros((2, max(P - 1, 0)))
+        self.e = np.zeros(P)
+        self.n = 0
+
+    def _updateInverse(self, r):
+        """
+        slide the PxP correlation matrix by one sample and update its inverse in O(P^2), in place
+        :param r: new first row, r[j] = x(n) . x(n-j) (+ delta for j = 0)
+        :return:
+        """
+        M = self.R_inv
+        if self.P == 1:
+            M[0, 0] = 1.0 / r[0]
+            return
+
+        # 新矩阵右下角即旧矩阵左上角 A, 其逆 S = A^-1 是旧逆的 Schur 补 A' - m m^T / c, 只需要 S b
+        N, U, V = self.R_inv_next, self.U, self.V
+        A, m = M[:-1, :-1], M[:-1, -1]
+        b = r[1:]
+        np.copyto(U[0], m)
+        np.multiply(m, -1.0 / M[-1, -1], out=V[0])
+        np.matmul(A, b, out=U[1])
+        np.multiply(V[0], m @ b, out=V[1])
+        np.add(U[1], V[1], out=U[1])
+        s = r[0] - b @ U[1]
+        np.multiply(U[1], 1.0 / s, out=V[1])
+
+        # 按首行首列分块求逆, 右下角 S + Sb Sb^T / s = A' + U^T V
+        np.matmul(U.T, V, out=N[1:, 1:])
+        np.add(N[1:, 1:], A, out=N[1:, 1:])
+        N[0, 0] = 1.0 / s
+        np.negative(V[1], out=N[0, 1:])
+        N[1:, 0] = N[0, 1:]
+        self.R_inv, self.R_inv_next = N, M
+
+    def process(self, far_block, near_block):
+        """
+        cancel echo for one block of any length
+        :param far_block: far-end samples
+        :param near_block: microphone samples, same length as far_block
+        :return: echo cancelled block
+        """
+        P, size = self.P, self.size
+        out_block = np.zeros(len(near_block))
+
+        for i in range(len(near_block)):
+            x_pos = (self.x_pos - 1) % size
+            self.x_buffer[x_pos] = far_block[i]
+            self.x_buffer[x_pos + size] = far_block[i]
+            self.x_pos = x_pos
+            d_pos = (self.d_pos - 1) % P
+            self.d_buffer[d_pos] = near_block[i]
+            self.d_buffer[d_pos + P] = near_block[i]
+            self.d_pos = d_pos
+
+            # X 的第 j 行为 x(n-j) 的 L 维向量
+            X = self.frames[x_pos:x_pos + P]
+            d = self.d_buffer[d_pos:d_pos + P]
+
+            r = X @ X[0]
+            r[0] += self.delta
+            self.n += 1
+            if self.n % self.refresh == 0:
+                self.R_inv[:] = np.linalg.inv(X @ X.T + self.delta * np.identity(P))
+            else:
+                self._updateInverse(r)
+
+            e = np.matmul(X, self.w, out=self.e)
+            np.subtract(d, e, out=e)
+            out_block[i] = e[0]
+            self.w += self.mu * (self.R_inv @ e) @ X
+
+        return out_block
+
+
+def convergenceTime(near, error, target=10.0, decimation=160):
+    """
+    first sample where the running ERLE reaches target dB
+    :return: samples to convergence, -1 if never reached
+    """
+    metrics = AECMetrics(decimation=decimation)
+    metrics.update(near, error)
+    series = metrics.series()
+    hits = np.nonzero(series["ERLE"] >= target)[0]
+    return int(series["index"][hits[0]]) if len(hits) else -1
+
+
+if __name__ == "__main__":
+    far, sr = librosa.load("./far.wav", sr=16000)
+    near, sr = librosa.load("./near.wav", sr=16000)
+
+    # 只取开头的单讲段, 比较收敛速度和每秒音频的 CPU 时间
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    N = int(seconds * sr)
+    far, near = far[:N], near[:N]
+    L = 128
+
+    results = []
+    output = None
+    for name in ["NLMS", "APA", "Kalman"]:
+        start = time.process_time()
+        if name == "NLMS":
+            e = StreamingLMS(L=L, mu=0.5, normalized=True, DTDbegin=N).process(far, near)
+            d = near
+        elif name == "APA":
+            e = APA(L=L, P=4).process(far, near)
+            d = near
+            output = e
+        else:
+            # e[i] 对应 near[i+L]
+            e = diagonalKalman(far, near, L)[:N - L]
+            d = near[L:]
+        cpu = time.process_time() - start
+        results.append((name, convergenceTime(d, e), cpu / (len(far) / sr)))
+
+    print('%-8s %22s %22s' % ("method", "samples to 10 dB ERLE", "CPU s per audio s"))
+    for name, samples, cpu in results:
+        print('%-8s %22d %22.4f' % (name, samples, cpu))
+
+    sf.write("./apa_out.wav", output.astype(np.float32), sr)
@@ -8,11 +8,18 @@
 @Version: v0.1
 """
 
+import os
+import sys
 import librosa
 import numpy as np
 from tqdm import tqdm
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from aec_metrics import AECMetrics
+from echo_path_state import statePath, saveState, loadState, checkShape
+from delay_estimator import alignReference
+
 
 far, sr = librosa.load("./far.wav", sr=16000)
 near, sr = librosa.load("./near.wav", sr=16000)
@@ -22,15 +29,24 @@ N = len(far)            # 迭代长度
 T = 0.92                # 双端检测阈值
 lambda_DTD=0.95         # DTD更新系数
 DTDbegin=20000          # DTD 开始检测时间
+device = "default"      # 设备ID, 用于保存/恢复回声路径
+align_delay = True      # 先估计并补偿整体延时, 滤波器只需建模回声尾部
 
 w = np.zeros(L)
 xin = np.zeros(L)
 
+# 从该设备上次收敛的滤波器开始, 此时无需等待 DTDbegin
+state_path = statePath(device, "lms")
+state = loadState(state_path)
+if state is not None:
+    w = checkShape(state, "w", (L,)).astype(np.float64)
+    DTDbegin = 0
+
 # DTD相关参数
 varMIC = np.zeros(N)
 r_em = np.zeros(N)
 
-x = far
+x = alignReference(far, near, margin=L // 4, taps=L)[0] if align_delay else far
 d = near
 
 mu = 0.014
@@ -38,9 +54,6 @@ y = np.zeros(N)
 e = np.zeros(N)
 threshold = np.zeros(N)
 decision_statistic = np.zeros(N)
-powerD = np.zeros(N)
-powerE = np.zeros(N)
-ERLE = np.zeros(N)
 
 for i in tqdm(range(N)):
     for j in range(L - 1, 0, -1):
@@ -66,10 +79,13 @@ for i in tqdm(range(N)):
     if decision_statistic[i] > threshold[i]:
         w = wtemp
 
-    # ERLE
-    powerD[i] = np.abs(d[i]) ** 2 # Power of Microphone signal
-    powerE[i] = np.abs(e[i]) ** 2 # power of Error signal
-    ERLE[i]=10 * np.log10(np.mean(powerD[i:i+L])/np.mean(powerE[i:i+L]))
+# ERLE, 递归平滑, 每个样本 O(1)
+metrics = AECMetrics(decimation=160)
+double_talk = (np.arange(N) >= DTDbegin) & (decision_statistic <= T)
+metrics.update(d, e, x, double_talk)
+series = metrics.series()
+print(metrics.summary())
+saveState(state_path, {"w": w})
 
 # 画图
 time = np.arange(0, len(far)) * (1.0 / sr)
@@ -108,7 +124,7 @@ plt.tight_layout()
 
 # ERLE
 ax = fig.add_subplot(6, 1, 6)
-ax.plot(time, ERLE, 'b')
+ax.plot(series["index"] * (1.0 / sr), series["ERLE"], 'b')
 plt.ylabel("ERLE")
 plt.tight_layout()
 
@@ -0,0 +1,143 @@
+"""
+@FileName: PBFDAF.py
+@Description: Implement partitioned-block frequency-domain adaptive filter (PBFDAF/MDF) AEC
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from echo_path_state import checkShape
+from dtd import NCCDetector
+
+
+class PBFDAF:
+    def __init__(self, L=1024, block_size=256, mu=0.2, beta=0.9, delta=1.0,
+                 T=0.9, lambda_DTD=0.95, DTDbegin=20000, dtd=None):
+        """
+        :param L: filter length, rounded up to a multiple of block_size
+        :param block_size: samples per block, also the hop of the 2*block_size FFT
+        :param mu: normalized step size
+        :param beta: smoothing factor of the far-end power spectrum
+        :param delta: regularization of the far-end power spectrum
+        :param T: double talk detection threshold
+        :param lambda_DTD: DTD update factor of the legacy NCC statistic, see dtd.NCCDetector
+        :param DTDbegin: sample index where DTD starts working
+        :param dtd: double talk detector from dtd.py, NCCDetector(T, lambda_DTD, DTDbegin) by default
+        """
+        self.N = block_size                                  # 块长
+        self.P = int(np.ceil(L / block_size))                # 分块数
+        self.L = self.P * self.N                             # 滤波器抽头系数
+        self.mu = mu
+        self.beta = beta
+        self.delta = delta
+        self.T = T
+        self.lambda_DTD = lambda_DTD
+        self.DTDbegin = DTDbegin
+
+        bins = self.N + 1
+        self.W = np.zeros((self.P, bins), dtype=np.complex128)   # 各分块的频域滤波器
+        self.X = np.zeros((self.P, bins), dtype=np.complex128)   # 频域延迟线
+        self.power = np.zeros(bins)                              # 远端功率谱
+        self.x_old = np.zeros(self.N)                            # 上一块远端信号
+
+        # DTD 按块判决, 块内任一样本判为双讲则冻结
+        self.dtd = dtd if dtd is not None else NCCDetector(T, lambda_DTD, DTDbegin)
+
+    def process(self, far_block, near_block):
+        """
+        cancel echo for one block
+        :param far_block: far-end block of block_size samples
+        :param near_block: microphone block of block_size samples
+        :return: error (echo cancelled) block, echo estimate block, decision statistic of the block
+        """
+        N = self.N
+        far_block = np.asarray(far_block, dtype=np.float64)
+        near_block = np.asarray(near_block, dtype=np.float64)
+
+        # 更新频域延迟线
+        self.X = np.roll(self.X, 1, axis=0)
+        self.X[0] = np.fft.rfft(np.concatenate([self.x_old, far_block]))
+        self.x_old = far_block
+
+        # 回声估计, 只保留线性卷积部分
+        Y = np.sum(self.W * self.X, axis=0)
+        y = np.fft.irfft(Y, 2 * N)[N:]
+        e = near_block - y
+
+        # DTD
+        adapt = np.all(self.dtd.process(far_block, near_block, e))
+        decision_statistic = self.dtd.statistic[-1]
+
+        self.power = self.beta * self.power + (1 - self.beta) * np.abs(self.X[0]) ** 2
+        if adapt:
+            E = np.fft.rfft(np.concatenate([np.zeros(N), e]))
+            G = self.mu * E / (self.power + self.delta)
+            self.W += np.conj(self.X) * G
+
+            # 梯度约束, 保证是线性卷积
+            w = np.fft.irfft(self.W, 2 * N, axis=1)
+            w[:, N:] = 0
+            self.W = np.fft.rfft(w, axis=1)
+
+        return e, y, decision_statistic
+
+    def getState(self):
+        """
+        converged filter and far-end power for warm start
+        :return: dict of arrays
+        """
+        return {"W": self.W, "power": self.power}
+
+    def setState(self, state):
+        """
+        warm start from a saved state, DTD is active from the first sample
+        :param state: dict returned by getState
+        :return:
+        """
+        self.W = checkShape(state, "W", self.W.shape).astype(np.complex128)
+        self.power = checkShape(state, "power", self.power.shape).astype(np.float64)
+        if isinstance(self.dtd, NCCDetector):
+            self.dtd.n = max(self.dtd.n, self.dtd.DTDbegin)
+
+    def run(self, far, near):
+        """
+        cancel echo for whole signals
+        :param far: far-end signal
+        :param near: microphone signal
+        :return: error (echo cancelled) signal, echo estimate, per-block decision statistic
+        """
+        N = self.N
+        frame_num = min(len(far), len(near)) // N
+        e = np.zeros(frame_num * N)
+        y = np.zeros(frame_num * N)
+        decision_statistic = np.zeros(frame_num)
+        for i in range(frame_num):
+            k = i * N
+            e[k:k + N], y[k:k + N], decision_statistic[i] = self.process(far[k:k + N], near[k:k + N])
+        return e, y, decision_statistic
+
+
+if __name__ == "__main__":
+    far, sr = librosa.load("./far.wav", sr=16000)
+    near, sr = librosa.load("./near.wav", sr=16000)
+
+    aec = PBFDAF(L=1024, block_size=256, T=0.9, lambda_DTD=0.95, DTDbegin=20000)
+
+    start = time.time()
+    e, y, decision_statistic = aec.run(far, near)
+    end = time.time()
+
+    duration = len(e) / sr
+    print('Running time of PBFDAF: %s Seconds' % (end - start))
+    print('Real-time factor of PBFDAF: %.4f' % ((end - start) / duration))
+    sf.write("./pbfdaf_out.wav", e.astype(np.float32), sr)
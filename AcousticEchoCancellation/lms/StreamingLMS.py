@@ -0,0 +1,143 @@
+"""
+@FileName: StreamingLMS.py
+@Description: Implement streaming LMS/NLMS AEC with constant memory
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from aec_metrics import AECMetrics
+from echo_path_state import checkShape
+from delay_estimator import DelayAligner
+from dtd import NCCDetector
+
+
+class StreamingLMS:
+    def __init__(self, L=128, mu=0.014, normalized=False, eps=1e-6, T=0.9, lambda_DTD=0.95, DTDbegin=20000,
+                 dtd=None):
+        """
+        :param L: filter length
+        :param mu: step size, used as 2*mu for LMS and as the normalized step for NLMS
+        :param normalized: use NLMS instead of LMS
+        :param eps: regularization of the NLMS input power
+        :param T: double talk detection threshold
+        :param lambda_DTD: DTD update factor of the legacy NCC statistic, see dtd.NCCDetector
+        :param DTDbegin: sample index where DTD starts working
+        :param dtd: double talk detector from dtd.py, NCCDetector(T, lambda_DTD, DTDbegin) by default
+                    the a priori error is only computed for detectors whose uses_error is set
+        """
+        self.L = L                              # 滤波器抽头系数
+        self.mu = mu
+        self.normalized = normalized
+        self.eps = eps
+        self.T = T                              # 双端检测阈值
+        self.lambda_DTD = lambda_DTD            # DTD更新系数
+        self.DTDbegin = DTDbegin                # DTD 开始检测时间
+
+        self.w = np.zeros(L)
+        # 参考信号环形缓冲, 每个样本写两次, buffer[pos:pos+L] 始终是从新到旧的连续视图
+        self.buffer = np.zeros(2 * L)
+        self.pos = 0
+        self.power = 0.0                        # 缓冲内参考信号能量, 用于 NLMS
+
+        # DTD 按块判决, 返回逐样本的更新掩码
+        self.dtd = dtd if dtd is not None else NCCDetector(T, lambda_DTD, DTDbegin)
+        self.decision_statistic = np.zeros(0)
+
+    def getState(self):
+        """
+        converged filter taps for warm start
+        :return: dict of arrays
+        """
+        return {"w": self.w}
+
+    def setState(self, state):
+        """
+        warm start from a saved state, DTD is active from the first sample
+        :param state: dict returned by getState
+        :return:
+        """
+        self.w = checkShape(state, "w", self.w.shape).astype(np.float64)
+        if isinstance(self.dtd, NCCDetector):
+            self.dtd.n = max(self.dtd.n, self.dtd.DTDbegin)
+
+    def process(self, far_block, near_block):
+        """
+        cancel echo for one block of any length
+        :param far_block: far-end samples
+        :param near_block: microphone samples, same length as far_block
+        :return: echo cancelled block
+        """
+        L = self.L
+        far_block = np.asarray(far_block, dtype=np.float64)
+        near_block = np.asarray(near_block, dtype=np.float64)
+        out_block = np.zeros(len(near_block))
+
+        # 用块开始时的滤波器算先验误差, 一次得到整块的 DTD 掩码, 检测器用不到时不算
+        prior_error = None
+        if getattr(self.dtd, "uses_error", True):
+            history = self.buffer[self.pos:self.pos + L - 1][::-1]
+            prior_error = near_block - np.convolve(np.concatenate([history, far_block]), self.w, 'valid')
+        adapt = self.dtd.process(far_block, near_block, prior_error)
+        self.decision_statistic = self.dtd.statistic
+
+        for i in range(len(near_block)):
+            x = far_block[i]
+            d = near_block[i]
+
+            # 写入环形缓冲并维护能量
+            pos = (self.pos - 1) % L
+            self.power += x * x - self.buffer[pos] * self.buffer[pos]
+            self.buffer[pos] = x
+            self.buffer[pos + L] = x
+            self.pos = pos
+            xin = self.buffer[pos:pos + L]
+            if pos == 0:
+                # 每 L 个样本重新求和一次, 避免累计误差
+                self.power = np.dot(xin, xin)
+
+            # LMS
+            error = d - np.dot(self.w, xin)
+            out_block[i] = error
+
+            if adapt[i]:
+                if self.normalized:
+                    self.w += (self.mu * error / (self.eps + self.power)) * xin
+                else:
+                    self.w += (2 * self.mu * error) * xin
+
+        return out_block
+
+
+if __name__ == "__main__":
+    far, sr = librosa.load("./far.wav", sr=16000)
+    near, sr = librosa.load("./near.wav", sr=16000)
+
+    # 延时估计按块取整, 块长加余量必须小于滤波器长度
+    L = 128
+    block_size = 64
+    aligner = DelayAligner(block_size=block_size, margin=L // 4, taps=L)
+    aec = StreamingLMS(L=L, mu=0.014)
+    metrics = AECMetrics(decimation=160)
+    output = np.zeros(len(near))
+
+    start = time.time()
+    for k in range(0, len(near) - block_size + 1, block_size):
+        far_block = aligner.process(far[k:k + block_size], near[k:k + block_size])
+        output[k:k + block_size] = aec.process(far_block, near[k:k + block_size])
+        metrics.update(near[k:k + block_size], output[k:k + block_size], far[k:k + block_size])
+    end = time.time()
+
+    print('Running time of StreamingLMS: %s Seconds' % (end - start))
+    print(metrics.summary())
+    sf.write("./streaming_lms_out.wav", output.astype(np.float32), sr)
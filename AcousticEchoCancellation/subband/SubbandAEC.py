@@ -0,0 +1,132 @@
+"""
+@FileName: SubbandAEC.py
+@Description: Implement subband AEC with a uniform DFT filterbank and per-band NLMS
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import time
+import numpy as np
+import librosa
+import soundfile as sf
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from aec_metrics import AECMetrics
+
+
+class SubbandAEC:
+    def __init__(self, L=1024, nfft=256, hop=64, mu=0.5, delta=5.0, dtd=None):
+        """
+        :param L: fullband echo path length to cover in samples
+        :param nfft: frame length and FFT size of the filterbank
+        :param hop: frame shift, i.e. the decimation factor of every band
+        :param mu: normalized step size of the band NLMS filters
+        :param delta: regularization of the band input power
+        :param dtd: optional detector from dtd.py that works without the error signal (NCC, Geigel, coherence)
+        """
+        self.nfft = nfft
+        self.hop = hop
+        self.mu = mu
+        self.delta = delta
+        self.dtd = dtd
+        self.taps = int(np.ceil(L / hop)) + nfft // hop - 1         # 每个子带的抽头数
+        bins = nfft // 2 + 1
+
+        # sqrt-hann 分析/综合窗, 交叠相加后的增益为 nfft / (2 * hop)
+        self.window = np.sqrt(np.hanning(nfft + 1)[:-1])
+        self.scale = 2.0 * hop / nfft
+
+        self.far_frame = np.zeros(nfft)
+        self.near_frame = np.zeros(nfft)
+        self.output = np.zeros(nfft)                                 # 交叠相加尾部
+
+        self.X = np.zeros((bins, self.taps), dtype=np.complex128)   # 每个子带的参考信号延迟线
+        self.W = np.zeros((bins, self.taps), dtype=np.complex128)   # 每个子带的滤波器
+        self.power = np.zeros(bins)                                  # 延迟线内的子带能量
+
+    @property
+    def latency(self):
+        """
+        algorithmic delay of process() in samples
+        """
+        return self.nfft - self.hop
+
+    def process(self, far_block, near_block):
+        """
+        cancel echo for one block of hop samples
+        :param far_block: far-end block
+        :param near_block: microphone block
+        :return: echo cancelled block, delayed by self.latency samples
+        """
+        hop = self.hop
+        self.far_frame = np.concatenate([self.far_frame[hop:], far_block])
+        self.near_frame = np.concatenate([self.near_frame[hop:], near_block])
+
+        # 分析滤波器组
+        Xk = np.fft.rfft(self.window * self.far_frame)
+        D = np.fft.rfft(self.window * self.near_frame)
+
+        # 所有子带同时更新延迟线和能量
+        self.power += np.abs(Xk) ** 2 - np.abs(self.X[:, -1]) ** 2
+        self.X = np.roll(self.X, 1, axis=1)
+        self.X[:, 0] = Xk
+
+        E = D - np.sum(self.W * self.X, axis=1)
+
+        adapt = True
+        if self.dtd is not None:
+            adapt = np.all(self.dtd.process(far_block, near_block))
+        if adapt:
+            self.W += (self.mu * E / (np.maximum(self.power, 0) + self.delta))[:, None] * np.conj(self.X)
+
+        # 综合滤波器组, 加权交叠相加
+        self.output += self.scale * self.window * np.fft.irfft(E, self.nfft)
+        out_block = self.output[:hop].copy()
+        self.output = np.concatenate([self.output[hop:], np.zeros(hop)])
+        return out_block
+
+    def run(self, far, near):
+        """
+        cancel echo for whole signals, the filterbank delay is compensated
+        :param far: far-end signal
+        :param near: microphone signal
+        :return: echo cancelled signal aligned with near
+        """
+        hop = self.hop
+        N = min(len(far), len(near))
+        pad = self.latency
+        far = np.concatenate([far[:N], np.zeros(pad + hop)])
+        near = np.concatenate([near[:N], np.zeros(pad + hop)])
+        frame_num = (N + pad) // hop + 1
+
+        e = np.zeros(frame_num * hop)
+        for i in range(frame_num):
+            k = i * hop
+            e[k:k + hop] = self.process(far[k:k + hop], near[k:k + hop])
+        return e[pad:pad + N]
+
+
+if __name__ == "__main__":
+    far, sr = librosa.load("./far.wav", sr=16000)
+    near, sr = librosa.load("./near.wav", sr=16000)
+
+    aec = SubbandAEC(L=1024, nfft=256, hop=64)
+
+    start = time.time()
+    e = aec.run(far, near)
+    end = time.time()
+
+    duration = len(e) / sr
+    print('Running time of SubbandAEC: %s Seconds' % (end - start))
+    print('Real-time factor of SubbandAEC: %.4f' % ((end - start) / duration))
+
+    metrics = AECMetrics(decimation=160)
+    metrics.update(near[:len(e)], e, far[:len(e)])
+    print(metrics.summary())
+
+    sf.write("./subband_out.wav", e, sr)
@@ -8,26 +8,96 @@
 @Version: v0.1
 """
 
+import time
 import librosa
+from scipy import fft as sp_fft
 from basic_functions import *
+from framing import frameView, getWindow
+from noise_tracker import MCRA
+from noise_profile import NoiseProfileStore
 
 class SpectralSubtraction:
-    def __init__(self, data, sr, win_length=240, overlapping_rate=0.5, beta=0.002, noise_frames=5):
-        self.data, self.fs = data, sr                                          # wave data and sample rate
+    def __init__(self, data, sr, win_length=240, overlapping_rate=0.5, beta=0.002, noise_frames=5,
+                 noise_tracking=False, noise_spectrum=None, workers=-1):
+        self.data, self.fs = data, sr                                          # wave data (..., samples) and sample rate
         self.noise_frames = noise_frames                                       # frame number to estimate noise spectral
+        self.noise_tracking = noise_tracking                                   # keep updating noise with MCRA
+        self.noise_spectrum = noise_spectrum                                   # stored noise profile, scale of stft()
+        self.noise_estimate = None                                             # final noise estimate of the last run
         self.win_length = win_length                                           # the number of samples in a frame
         self.overlapping_rate = overlapping_rate                               # overlapping rate
         self.overlapping_length = int(overlapping_rate * win_length)           # overlapping length
         self.hop_length = int((1 - overlapping_rate) * win_length)             # frame shift length
         self.beta = beta                                                       # beta for Berouti spectral subtraction
         self.nfft = 2 * int(pow(2, nextpow2(win_length)))                      # fft points
+        self.window = getWindow('Hanning', win_length, sym=False)              # analysis / synthesis window
+        self.workers = workers                                                 # FFT threads, -1 uses all cores
         self.output = None                                                     # output wave
 
-    def getNoiseSpectrum(self):
+    def stft(self, data, hop_length=None, pad=True):
+        """
+        frame the whole signal as a strided view and transform all frames in one batched rfft
+        :param data: wave data, shape (samples,) or (channels, samples)
+        :param hop_length: frame shift, self.hop_length by default
+        :param pad: pad so that every sample is covered by the same number of frames as the middle of the signal
+        :return: complex spectrum, shape (..., nfft//2 + 1, frames)
+        """
+        hop_length = hop_length or self.hop_length
+        data = np.asarray(data)
+        if pad:
+            length = data.shape[-1]
+            frames_num = -(-(length + self.win_length - hop_length) // hop_length)
+            tail = (frames_num - 1) * hop_length + self.win_length - length - (self.win_length - hop_length)
+            data = np.pad(data, [(0, 0)] * (data.ndim - 1) + [(self.win_length - hop_length, tail)])
+        frames = frameView(data, self.win_length, hop_length)
+        spectrum = sp_fft.rfft(frames * self.window, n=self.nfft, axis=-1, workers=self.workers)
+        return np.swapaxes(spectrum, -1, -2)
+
+    def istft(self, spectrum, length):
+        """
+        inverse of stft with a single weighted overlap-add
+        :param spectrum: complex spectrum, shape (..., nfft//2 + 1, frames)
+        :param length: output length
+        :return: wave data, shape (..., length)
+        """
+        hop, win = self.hop_length, self.win_length
+        frames = sp_fft.irfft(np.swapaxes(spectrum, -1, -2), n=self.nfft, axis=-1, workers=self.workers)
+        frames = frames[..., :win] * self.window
+        lead, frames_num = frames.shape[:-2], frames.shape[-2]
+
+        # 每帧切成 R 段 hop 长度的块, R 次整块相加完成交叠相加
+        R = -(-win // hop)
+        pad = [(0, 0)] * (frames.ndim - 1) + [(0, R * hop - win)]
+        blocks = np.pad(frames, pad).reshape(lead + (frames_num, R, hop))
+        weights = np.pad(self.window ** 2, (0, R * hop - win)).reshape(R, hop)
+        output = np.zeros(lead + (frames_num + R - 1, hop))
+        weight_sum = np.zeros((frames_num + R - 1, hop))
+        for r in range(R):
+            output[..., r:r + frames_num, :] += blocks[..., r, :]
+            weight_sum[r:r + frames_num] += weights[r]
+
+        output = output.reshape(lead + (-1,)) / np.maximum(weight_sum.reshape(-1), 1e-8)
+        return output[..., win - hop:win - hop + length]
+
+    def getNoiseSpectrum(self, vectorized=False):
         """
         estimate noise spectrum by using the front self.noise_frames frames
-        :return: noise spectrum
+        :param vectorized: use the batched stft, the result matches the scale of stft()
+        :return: noise spectrum, shape (..., bins, 1), one per channel when vectorized
         """
+        if vectorized and self.noise_spectrum is not None:
+            # 使用已保存的噪声谱, 不再占用开头的帧
+            noise_spectrum = np.asarray(self.noise_spectrum, dtype=np.float64)
+            if noise_spectrum.shape[-1] == 1:
+                noise_spectrum = noise_spectrum[..., 0]
+            return noise_spectrum[..., None]
+        if vectorized:
+            noise = np.asarray(self.data)[..., :self.noise_frames * self.win_length]
+            return np.mean(np.abs(self.stft(noise, self.win_length, pad=False)), axis=-1, keepdims=True)
+        if self.noise_spectrum is not None:
+            # 逐帧模式的 librosa.stft 与 stft() 的幅度尺度不同, 保存的噪声谱不能直接使用
+            raise ValueError('noise_spectrum is on the scale of stft(), use vectorized=True to apply it')
+
         noise_spectrum = np.zeros([self.nfft//2 + 1,1])
         for i in range(self.noise_frames):
             frame = self.data[i*self.win_length:(i+1)*self.win_length]
@@ -36,12 +106,35 @@ class SpectralSubtraction:
         noise_spectrum = noise_spectrum / self.noise_frames
         return noise_spectrum
 
-    def simpleSpectralSubtraction(self):
+    def getNoiseTracker(self, noise_spectrum=None):
+        """
+        MCRA noise tracker with a minimum search window of about one second
+        :param noise_spectrum: initial noise magnitude spectrum, shape (..., bins)
+        :return: MCRA instance
+        """
+        return MCRA(window_frames=max(1, round(self.fs / self.hop_length)), noise_spectrum=noise_spectrum)
+
+    def simpleSpectralSubtraction(self, vectorized=False):
         """
         simple spectral subtraction
+        :param vectorized: process the whole signal with one batched stft / istft instead of frame by frame
         :return: enhanced speech
         """
+        if vectorized:
+            noise_spectrum = self.getNoiseSpectrum(vectorized=True)
+            spectrum = self.stft(self.data)
+            magnitude = np.abs(spectrum)
+            if self.noise_tracking:
+                noise_spectrum = self.getNoiseTracker(noise_spectrum[..., 0]).track(magnitude)
+            self.noise_estimate = noise_spectrum[..., -1].copy()
+            sub_speech = np.maximum(magnitude - noise_spectrum, 0)
+            self.output = self.istft(sub_speech * np.exp(1.0j * np.angle(spectrum)), np.shape(self.data)[-1])
+            return self.output
+
+        if np.ndim(self.data) > 1:
+            raise ValueError('frame-wise mode only takes 1-D data, use vectorized=True for multichannel input')
         noise_spectrum = self.getNoiseSpectrum()
+        tracker = self.getNoiseTracker(noise_spectrum[:, 0]) if self.noise_tracking else None
         frames_nums = len(self.data)//self.hop_length
 
         processed_data = np.zeros(frames_nums * self.hop_length)
@@ -52,6 +145,8 @@ class SpectralSubtraction:
             spectrum = librosa.stft(frame, n_fft=self.nfft, hop_length=self.nfft)
             magnitude = np.abs(spectrum)
             phase = np.angle(spectrum)
+            if tracker is not None:
+                noise_spectrum = tracker.update(magnitude[:, 0])[:, None]
 
             # spectral subtraction and truncation
             sub_speech = magnitude - noise_spectrum
@@ -79,12 +174,33 @@ class SpectralSubtraction:
             else:
                 return 1
 
-    def BeroutiSpectralSubtraction(self):
+    def BeroutiSpectralSubtraction(self, vectorized=False):
         """
         Berouti spectral subtraction
+        :param vectorized: process the whole signal with one batched stft / istft instead of frame by frame
         :return: enhanced speech
         """
+        if vectorized:
+            noise_spectrum = self.getNoiseSpectrum(vectorized=True)
+            spectrum = self.stft(self.data)
+            magnitude = np.abs(spectrum)
+            if self.noise_tracking:
+                noise_spectrum = self.getNoiseTracker(noise_spectrum[..., 0]).track(magnitude)
+            self.noise_estimate = noise_spectrum[..., -1].copy()
+
+            # 所有帧的 SNR 和 alpha 一次算出, 与 getSNR / getAlpha 相同
+            snr = 20 * np.log10(norm(magnitude, axis=-2, keepdims=True) / norm(noise_spectrum, axis=-2, keepdims=True))
+            alpha = np.select([snr < -5, snr > 20], [4.0, 1.0], 3 - snr * 2 / 20)
+            sub_speech = magnitude - alpha * noise_spectrum
+            sub_speech = np.where(sub_speech < 0, self.beta * noise_spectrum, sub_speech)
+
+            self.output = self.istft(sub_speech * np.exp(1.0j * np.angle(spectrum)), np.shape(self.data)[-1])
+            return self.output
+
+        if np.ndim(self.data) > 1:
+            raise ValueError('frame-wise mode only takes 1-D data, use vectorized=True for multichannel input')
         noise_spectrum = self.getNoiseSpectrum()
+        tracker = self.getNoiseTracker(noise_spectrum[:, 0]) if self.noise_tracking else None
         frames_nums = len(self.data) // self.hop_length
         processed_data = np.zeros(len(self.data))
 
@@ -94,14 +210,14 @@ class SpectralSubtraction:
             spectrum = librosa.stft(frame, n_fft=self.nfft, hop_length=self.nfft)
             magnitude = np.abs(spectrum)
             phase = np.angle(spectrum)
+            if tracker is not None:
+                noise_spectrum = tracker.update(magnitude[:, 0])[:, None]
 
             snr = getSNR(magnitude, noise_spectrum)
             alpha = self.getAlpha(snr)
             sub_speech = magnitude - alpha * noise_spectrum
 
-            for j in range(len(sub_speech)):
-                if sub_speech[j] < 0:
-                    sub_speech[j] = self.beta * noise_spectrum[j]
+            sub_speech = np.where(sub_speech < 0, self.beta * noise_spectrum, sub_speech)
 
             sub_speech_spectrum = sub_speech * np.exp(1.0j * phase)
             frame = librosa.istft(sub_speech_spectrum, window="hann", hop_length=self.nfft, length=self.win_length)
@@ -112,17 +228,241 @@ class SpectralSubtraction:
         self.output = processed_data
         return processed_data
 
+    def getBandAlpha(self, snr):
+        """
+        over-subtraction factor of every band, Kamath & Loizou
+        :param snr: band SNR in dB, any shape
+        :return: alpha, same shape
+        """
+        return np.select([snr < -5, snr > 20], [4.75, 1.0], 4 - snr * 3 / 20)
+
+    def MultibandSpectralSubtraction(self, bands=4):
+        """
+        multi-band spectral subtraction, Kamath & Loizou 2002
+        every band has its own SNR and over-subtraction factor, all frames and bands are computed at once
+        :param bands: number of linearly spaced bands
+        :return: enhanced speech
+        """
+        noise_spectrum = self.getNoiseSpectrum(vectorized=True)
+        spectrum = self.stft(self.data)
+        magnitude = np.abs(spectrum)
+        if self.noise_tracking:
+            noise_spectrum = self.getNoiseTracker(noise_spectrum[..., 0]).track(magnitude)
+        self.noise_estimate = noise_spectrum[..., -1].copy()
+        power = magnitude ** 2
+        noise_power = np.broadcast_to(noise_spectrum ** 2, power.shape)
+
+        # 频点到子带的映射, 子带能量用 reduceat 一次求出
+        bins = self.nfft // 2 + 1
+        edges = np.linspace(0, bins, bands + 1).astype(np.int64)[:-1]
+        band_of_bin = np.searchsorted(edges, np.arange(bins), side="right") - 1
+        snr = 10 * np.log10(np.add.reduceat(power, edges, axis=-2) /
+                            (np.add.reduceat(noise_power, edges, axis=-2) + 1e-12) + 1e-12)
+        alpha = self.getBandAlpha(snr)[..., band_of_bin, :]
+
+        # 低频少减, 高频 (fs/2 - 2kHz 以上) 适中
+        freqs = np.arange(bins) * self.fs / self.nfft
+        delta = np.where(freqs <= 1000, 1.0, np.where(freqs <= self.fs / 2 - 2000, 2.5, 1.5))[:, None]
+
+        sub_power = power - alpha * delta * noise_power
+        sub_power = np.where(sub_power < 0, self.beta * power, sub_power)
+
+        self.output = self.istft(np.sqrt(sub_power) * np.exp(1.0j * np.angle(spectrum)), np.shape(self.data)[-1])
+        return self.output
+
     def saveWave(self, output_path):
         librosa.output.write_wav(output_path, self.output.astype(np.float32), self.fs)
 
 
+class StreamingSpectralSubtraction(SpectralSubtraction):
+    def __init__(self, sr, win_length=240, overlapping_rate=0.5, beta=0.002, noise_frames=5,
+                 method="simple", noise_spectrum=None, noise_tracking=False):
+        """
+        spectral subtraction on arbitrary-sized chunks with constant memory
+        the output lags the input by self.latency = win_length - hop_length samples (one hop at 50% overlap);
+        samples of a partial hop are held until the hop is complete
+        without noise_spectrum the first noise_frames * win_length samples are held as well, until the noise is
+        estimated from them the same way as getNoiseSpectrum(vectorized=True)
+        :param sr: sample rate
+        :param method: "simple" or "berouti"
+        :param noise_spectrum: initial noise magnitude spectrum, otherwise the first noise_frames frames are averaged
+        :param noise_tracking: keep updating the noise spectrum with MCRA after the initial estimate
+        """
+        super().__init__(None, sr, win_length, overlapping_rate, beta, noise_frames, noise_tracking, noise_spectrum)
+        if method not in ("simple", "berouti"):
+            raise NameError('Unrecongnized method')
+        self.method = method
+        win, hop, bins = self.win_length, self.hop_length, self.nfft // 2 + 1
+
+        # 输入环形缓冲, 每个样本写两次, buffer[pos:pos+win] 始终是从旧到新的一帧
+        self.buffer = np.zeros(2 * win)
+        self.pos = 0
+        self.fill = 0                                                          # 当前 hop 已收到的样本数
+
+        # 交叠相加缓冲, R 个 hop 长度的块循环使用
+        self.R = -(-win // hop)
+        self.ola = np.zeros((self.R, hop))
+        self.weight_sum = np.sum(np.pad(self.window ** 2, (0, self.R * hop - win)).reshape(self.R, hop), axis=0)
+        self.frames_count = 0
+
+        # 逐帧复用的工作缓冲, 处理过程中不再分配
+        self.frame = np.zeros(win)
+        self.spectrum = np.zeros(bins, dtype=np.complex128)
+        self.magnitude = np.zeros(bins)
+        self.gain = np.zeros(bins)
+        self.floor = np.zeros(bins)
+        self.mask = np.zeros(bins, dtype=bool)
+        self.time_frame = np.zeros(self.nfft)
+        self.out_frame = np.zeros(self.R * hop)
+
+        # 复制一份, 噪声跟踪原地更新时不改动调用方的噪声谱
+        self.noise = np.zeros(bins) if noise_spectrum is None else np.array(noise_spectrum, dtype=np.float64).reshape(-1)
+        self.noise_estimate = self.noise                                       # 实时更新, 可直接写回 NoiseProfileStore
+        self.noise_tracker = None
+        self.warmup = None
+        self.warmup_fill = 0
+        if noise_spectrum is None:
+            self.warmup = np.zeros(noise_frames * win)                         # 噪声估计完成前缓存的输入
+        elif noise_tracking:
+            self.noise_tracker = self.getNoiseTracker(self.noise.copy())
+
+    @property
+    def latency(self):
+        """
+        algorithmic delay in samples
+        """
+        return self.win_length - self.hop_length
+
+    def _write(self, piece):
+        W = self.win_length
+        n = len(piece)
+        first = min(n, W - self.pos)
+        self.buffer[self.pos:self.pos + first] = piece[:first]
+        self.buffer[self.pos + W:self.pos + W + first] = piece[:first]
+        self.buffer[:n - first] = piece[first:]
+        self.buffer[W:W + n - first] = piece[first:]
+        self.pos = (self.pos + n) % W
+
+    def _processFrame(self, out):
+        """
+        enhance the newest frame and write the finished hop to out
+        :param out: output hop, written in place
+        :return:
+        """
+        hop, win = self.hop_length, self.win_length
+        np.multiply(self.buffer[self.pos:self.pos + win], self.window, out=self.frame)
+        np.fft.rfft(self.frame, self.nfft, out=self.spectrum)
+        np.abs(self.spectrum, out=self.magnitude)
+
+        # 噪声谱由 MCRA 持续跟踪, 否则保持初始估计
+        if self.noise_tracker is not None:
+            np.copyto(self.noise, self.noise_tracker.update(self.magnitude))
+
+        if self.method == "simple":
+            np.subtract(self.magnitude, self.noise, out=self.gain)
+            np.maximum(self.gain, 0, out=self.gain)
+        else:
+            alpha = self.getAlpha(20 * np.log10(norm(self.magnitude) / (norm(self.noise) + 1e-12)))
+            np.multiply(self.noise, alpha, out=self.gain)
+            np.subtract(self.magnitude, self.gain, out=self.gain)
+            np.multiply(self.noise, self.beta, out=self.floor)
+            np.less(self.gain, 0, out=self.mask)
+            np.copyto(self.gain, self.floor, where=self.mask)
+
+        # 幅度相减等价于保留相位的实增益
+        np.maximum(self.magnitude, 1e-12, out=self.magnitude)
+        np.divide(self.gain, self.magnitude, out=self.gain)
+        np.multiply(self.spectrum, self.gain, out=self.spectrum)
+        np.fft.irfft(self.spectrum, self.nfft, out=self.time_frame)
+        np.multiply(self.time_frame[:win], self.window, out=self.out_frame[:win])
+
+        b = self.frames_count
+        for r in range(self.R):
+            block = self.ola[(b + r) % self.R]
+            np.add(block, self.out_frame[r * hop:(r + 1) * hop], out=block)
+        block = self.ola[b % self.R]
+        np.divide(block, self.weight_sum, out=out)
+        block[:] = 0
+        self.frames_count += 1
+
+    def _startNoise(self):
+        """
+        estimate the noise from the held samples, non-overlapping full frames as in getNoiseSpectrum(vectorized=True)
+        :return: the held samples, to be processed now
+        """
+        samples = self.warmup[:self.warmup_fill]
+        self.warmup = None
+        frames = samples if len(samples) >= self.win_length else np.pad(samples, (0, self.win_length - len(samples)))
+        np.mean(np.abs(self.stft(frames, self.win_length, pad=False)), axis=-1, out=self.noise)
+        if self.noise_tracking:
+            self.noise_tracker = self.getNoiseTracker(self.noise.copy())
+        return samples
+
+    def process(self, chunk):
+        """
+        :param chunk: PCM samples of any length
+        :return: enhanced samples of every hop completed by this chunk, delayed by self.latency
+                 during the noise warm-up nothing is returned, then all held hops at once
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if self.warmup is not None:
+            n = min(len(self.warmup) - self.warmup_fill, len(chunk))
+            self.warmup[self.warmup_fill:self.warmup_fill + n] = chunk[:n]
+            self.warmup_fill += n
+            if self.warmup_fill < len(self.warmup):
+                return np.zeros(0)
+            chunk = np.concatenate([self._startNoise(), chunk[n:]])
+        hop = self.hop_length
+        output = np.empty(((self.fill + len(chunk)) // hop) * hop)
+
+        k, j = 0, 0
+        while k < len(chunk):
+            n = min(hop - self.fill, len(chunk) - k)
+            self._write(chunk[k:k + n])
+            self.fill += n
+            k += n
+            if self.fill == hop:
+                self._processFrame(output[j:j + hop])
+                self.fill = 0
+                j += hop
+        return output
+
+    def flush(self):
+        """
+        push zeros through to get the held samples out
+        :return: the remaining latency + partial hop samples
+        """
+        # 输入短于噪声估计所需的长度时, 用已有的样本估计
+        head = self.process(self._startNoise()) if self.warmup is not None else np.zeros(0)
+        remaining = self.fill + self.latency
+        tail = self.process(np.zeros(-(-remaining // self.hop_length) * self.hop_length - self.fill))
+        return np.concatenate([head, tail[:remaining]])
+
+
 if __name__ == '__main__':
 
     x, sr = librosa.load("./sample.wav", sr=8000)
     ss = SpectralSubtraction(x, sr)
     x1 = ss.simpleSpectralSubtraction()
+
+    start = time.time()
     x2 = ss.BeroutiSpectralSubtraction()
+    print('Running time of frame-wise Berouti: %s Seconds' % (time.time() - start))
+    start = time.time()
+    x3 = ss.BeroutiSpectralSubtraction(vectorized=True)
+    print('Running time of vectorized Berouti: %s Seconds' % (time.time() - start))
+    x4 = ss.MultibandSpectralSubtraction()
+
     displaySpeech(x, 8000)
     displaySpeech(x1, 8000)
     displaySpeech(x2, 8000)
-    ss.saveWave("./output.wav")
\ No newline at end of file
+    displaySpeech(x3, 8000)
+    displaySpeech(x4, 8000)
+    ss.saveWave("./output.wav")
+
+    # 同一设备的下一个文件从保存的噪声谱开始, 处理完写回
+    store = NoiseProfileStore(path="./noise_profiles.npz")
+    ss = SpectralSubtraction(x, sr, noise_tracking=True, noise_spectrum=store.get("default", 0))
+    ss.simpleSpectralSubtraction(vectorized=True)
+    store.put("default", 0, ss.noise_estimate)
+    store.save()
\ No newline at end of file
@@ -10,9 +10,10 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy import special
 import subprocess
+from scipy import signal
 from numpy.linalg import norm
+import framing
 
 
 def normalization(data):
@@ -30,53 +31,23 @@ def enframe(samples, beta=8.5, overlapping=0, window_length=240, window_type='Re
     divede samples into frame
     :param samples:
     :param beta: parameter for kaiser window
-    :param frame_num:
+    :param overlapping: overlapping length
     :param window_length:
     :param window_type:
-    :return: enframed frames
+    :return: enframed frames, a partial last frame is zero padded
     """
-
-    frames_num = len(samples) // (window_length - overlapping)
-    frames = np.zeros([frames_num, window_length])
-    for i in range(frames_num):
-        start = i * (window_length - overlapping)
-        end = start + window_length
-        data = samples[start:end]
-
-        N = len(data)
-        x = np.linspace(0, N - 1, N, dtype=np.int64)
-
-        if window_type == 'Rectangle':
-            data = data
-        elif window_type == 'Triangle':
-            for i in range(N):
-                if i < N:
-                    data[i] = 2 * i / (N - 1)
-                else:
-                    data[i] = 2 - 2 * i / (N - 1)
-        elif window_type == 'Hamming':
-            w = 0.54 - 0.46 * np.cos(2 * np.pi * x / (N - 1))
-            data = data * w
-        elif window_type == 'Hanning':
-            w = 0.5 * (1 - np.cos(2 * np.pi * x / (N - 1)))
-            data = data * w
-        elif window_type == 'Blackman':
-            w = 0.42 - 0.5 * (1 - np.cos(2 * np.pi * x / (N - 1))) + 0.08 * np.cos(4 * np.pi * x / (N - 1))
-            data = data * w
-        elif window_type == 'Kaiser':
-            w = special.j0(beta * np.sqrt(1 - np.square(1 - 2 * x / (N - 1)))) / special.j0(beta)
-            data = data * w
-        else:
-            raise NameError('Unrecongnized window type')
-
-        frames[i] = data
-    return frames
+    hop_length = window_length - overlapping
+    frames_num = len(samples) // hop_length
+    tail = (frames_num - 1) * hop_length + window_length - len(samples)
+    if tail > 0:
+        samples = np.pad(samples, (0, tail))
+    return framing.enframe(samples, window_length, hop_length, window_type, beta)[:frames_num]
 
 
 def preEmphasis(samples, fs, alpha=0.9375, overlapping=0, window_length=240, window_type='Rectangle', display=False):
     """
     per emphasis speech
-    :param samples: sample data
+    :param samples: sample data, shape (samples,) or (channels, samples)
     :param fs: sample frequency
     :param alpha: parameter
     :param overlapping: overlapping length
@@ -85,16 +56,11 @@ def preEmphasis(samples, fs, alpha=0.9375, overlapping=0, window_length=240, win
     :param display: whether to display processed speech
     :return: processed speech
     """
-    y = np.zeros(len(samples))
-    y[0] = samples[0]
-
-    # pre emphasis
-    for i in range(1, len(samples)):
-        y[i] = samples[i] - alpha * samples[i-1]
+    y = PreEmphasisFilter(alpha).process(samples)
 
     if display:
-        time = np.arange(0, len(samples)) * (1.0 / fs)
-        plt.plot(time, samples)
+        time = np.arange(0, np.shape(samples)[-1]) * (1.0 / fs)
+        plt.plot(time, np.transpose(samples))
         plt.title("Pre-emphasis")
         plt.ylabel("Waveform")
         plt.xlabel("Time (seconds)")
@@ -103,6 +69,51 @@ def preEmphasis(samples, fs, alpha=0.9375, overlapping=0, window_length=240, win
     return y
 
 
+def deEmphasis(samples, alpha=0.9375):
+    """
+    de emphasis, the exact inverse of preEmphasis
+    :param samples: pre-emphasized data, shape (samples,) or (channels, samples)
+    :param alpha: parameter
+    :return: restored speech
+    """
+    return DeEmphasisFilter(alpha).process(samples)
+
+
+class PreEmphasisFilter:
+    def __init__(self, alpha=0.9375):
+        """
+        streaming pre emphasis y[n] = x[n] - alpha * x[n-1], the last input sample is carried across chunks
+        :param alpha: parameter
+        """
+        self.b = np.array([1.0, -alpha])
+        self.a = np.array([1.0])
+        self.zi = None
+
+    def process(self, chunk):
+        """
+        :param chunk: data, shape (samples,) or (channels, samples)
+        :return: filtered chunk
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if self.zi is None:
+            self.zi = np.zeros(chunk.shape[:-1] + (1,))
+        y, self.zi = signal.lfilter(self.b, self.a, chunk, axis=-1, zi=self.zi)
+        return y
+
+    def reset(self):
+        self.zi = None
+
+
+class DeEmphasisFilter(PreEmphasisFilter):
+    def __init__(self, alpha=0.9375):
+        """
+        streaming de emphasis y[n] = x[n] + alpha * y[n-1], the last output sample is carried across chunks
+        :param alpha: parameter
+        """
+        super().__init__(alpha)
+        self.b, self.a = self.a, self.b
+
+
 def displaySpeech(samples, fs):
     """
     display waveform of a given speech sample
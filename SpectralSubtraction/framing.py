@@ -0,0 +1,90 @@
+"""
+@FileName: framing.py
+@Description: Implement zero-copy framing with strided views and a cached window library
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+from functools import lru_cache
+import numpy as np
+
+WINDOW_TYPES = ('Rectangle', 'Triangle', 'Hamming', 'Hanning', 'Blackman', 'Kaiser')
+
+
+@lru_cache(maxsize=128)
+def _window(window_type, length, beta, dtype, sym):
+    # 非对称 (周期) 窗取 length + 1 点对称窗的前 length 点
+    N = length if sym else length + 1
+    if window_type == 'Rectangle':
+        w = np.ones(N)
+    elif window_type == 'Triangle':
+        w = np.bartlett(N)
+    elif window_type == 'Hamming':
+        w = np.hamming(N)
+    elif window_type == 'Hanning':
+        w = np.hanning(N)
+    elif window_type == 'Blackman':
+        w = np.blackman(N)
+    elif window_type == 'Kaiser':
+        w = np.kaiser(N, beta)
+    else:
+        raise NameError('Unrecongnized window type')
+    w = w[:length].astype(dtype)
+    w.setflags(write=False)
+    return w
+
+
+def getWindow(window_type, length, beta=8.5, dtype=np.float64, sym=True):
+    """
+    window from the cache, computed once per (type, length, beta, dtype, sym)
+    :param window_type: one of WINDOW_TYPES
+    :param length: window length
+    :param beta: parameter for kaiser window
+    :param dtype: window dtype
+    :param sym: symmetric window for filter design / analysis, False for the periodic window used by STFT overlap-add
+    :return: read-only window
+    """
+    beta = float(beta) if window_type == 'Kaiser' else None
+    return _window(window_type, int(length), beta, np.dtype(dtype).str, bool(sym))
+
+
+def frameView(samples, frame_length, hop_length, pad=False):
+    """
+    frames of the last axis as a strided view, no data is copied
+    :param samples: signal, shape (..., samples)
+    :param frame_length: samples per frame
+    :param hop_length: frame shift
+    :param pad: zero pad the end so a partial last frame is kept, this copies the signal once
+    :return: read-only view, shape (..., frames, frame_length)
+    """
+    samples = np.asarray(samples)
+    length = samples.shape[-1]
+    if pad:
+        frames_num = max(-(-(length - frame_length) // hop_length), 0) + 1
+        tail = (frames_num - 1) * hop_length + frame_length - length
+        if tail > 0:
+            samples = np.pad(samples, [(0, 0)] * (samples.ndim - 1) + [(0, tail)])
+    elif length < frame_length:
+        return np.zeros(samples.shape[:-1] + (0, frame_length), dtype=samples.dtype)
+    return np.lib.stride_tricks.sliding_window_view(samples, frame_length, axis=-1)[..., ::hop_length, :]
+
+
+def enframe(samples, frame_length, hop_length, window_type='Rectangle', beta=8.5, pad=False):
+    """
+    split a signal into windowed frames, the window is applied by broadcasting
+    :param samples: signal, shape (..., samples)
+    :param frame_length: samples per frame
+    :param hop_length: frame shift
+    :param window_type: one of WINDOW_TYPES
+    :param beta: parameter for kaiser window
+    :param pad: zero pad the end so a partial last frame is kept
+    :return: frames, shape (..., frames, frame_length), a read-only view for the rectangle window
+    """
+    frames = frameView(samples, frame_length, hop_length, pad)
+    if window_type == 'Rectangle':
+        return frames
+    dtype = frames.dtype if np.issubdtype(frames.dtype, np.floating) else np.float64
+    return frames * getWindow(window_type, frame_length, beta, dtype)
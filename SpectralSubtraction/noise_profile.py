@@ -0,0 +1,101 @@
+"""
+@FileName: noise_profile.py
+@Description: Implement a noise profile store keyed by device and channel with LRU eviction
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class NoiseProfileStore:
+    def __init__(self, capacity=256, max_age=None, path=None):
+        """
+        :param capacity: largest number of profiles kept, the least recently used one is evicted first
+        :param max_age: profiles older than max_age seconds are treated as missing, None keeps them forever
+        :param path: optional npz file the store is loaded from and saved to
+        """
+        self.capacity = capacity
+        self.max_age = max_age
+        self.path = path
+        self.profiles = OrderedDict()                                          # (device, channel) -> (timestamp, spectrum)
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def get(self, device_id, channel=0):
+        """
+        :param device_id: device identifier
+        :param channel: channel index
+        :return: noise magnitude spectrum, None if there is no fresh profile
+        """
+        key = (str(device_id), int(channel))
+        if key not in self.profiles:
+            return None
+        timestamp, spectrum = self.profiles[key]
+        if self.max_age is not None and time.time() - timestamp > self.max_age:
+            del self.profiles[key]
+            return None
+        self.profiles.move_to_end(key)
+        return spectrum
+
+    def put(self, device_id, channel, spectrum, timestamp=None):
+        """
+        store or replace a profile
+        :param device_id: device identifier
+        :param channel: channel index
+        :param spectrum: noise magnitude spectrum, shape (bins,), or (channels, bins) such as the noise_estimate of a
+                         multichannel run, then row i is stored under channel + i
+        :param timestamp: time of the estimate, now by default
+        :return:
+        """
+        spectrum = np.array(spectrum, dtype=np.float64)
+        if spectrum.ndim > 2:
+            raise ValueError('spectrum must have shape (bins,) or (channels, bins), got %s' % (spectrum.shape,))
+        timestamp = time.time() if timestamp is None else float(timestamp)
+        for i, row in enumerate(np.atleast_2d(spectrum)):
+            key = (str(device_id), int(channel) + i)
+            self.profiles[key] = (timestamp, row)
+            self.profiles.move_to_end(key)
+        while len(self.profiles) > self.capacity:
+            self.profiles.popitem(last=False)
+
+    def save(self, path=None):
+        """
+        save all profiles, oldest use first, the file is replaced atomically
+        :param path: npz file, self.path by default
+        :return:
+        """
+        path = path or self.path
+        arrays = {
+            "devices": np.array([k[0] for k in self.profiles], dtype=str),
+            "channels": np.array([k[1] for k in self.profiles], dtype=np.int64),
+            "timestamps": np.array([v[0] for v in self.profiles.values()], dtype=np.float64),
+        }
+        for i, (_, spectrum) in enumerate(self.profiles.values()):
+            arrays["spectrum_%d" % i] = spectrum
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        """
+        load profiles saved by save(), merged into the store in their saved LRU order
+        :param path: npz file, self.path by default
+        :return:
+        """
+        with np.load(path or self.path) as f:
+            for i, (device_id, channel, timestamp) in enumerate(zip(f["devices"], f["channels"], f["timestamps"])):
+                self.put(device_id, channel, f["spectrum_%d" % i], timestamp)
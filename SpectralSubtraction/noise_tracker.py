@@ -0,0 +1,96 @@
+"""
+@FileName: noise_tracker.py
+@Description: Implement MCRA (minima controlled recursive averaging) noise tracking
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import numpy as np
+
+
+class MCRA:
+    def __init__(self, alpha_s=0.8, alpha_p=0.2, alpha_d=0.95, delta=5.0, window_frames=64, noise_spectrum=None):
+        """
+        continuous noise estimation, Cohen & Berdugo 2002, O(bins) work per frame
+        :param alpha_s: smoothing factor of the noisy power spectrum
+        :param alpha_p: smoothing factor of the speech presence probability
+        :param alpha_d: smoothing factor of the noise power spectrum
+        :param delta: ratio to the local minimum above which a bin is taken as speech
+        :param window_frames: frames of the minimum search window, about one second
+        :param noise_spectrum: initial noise magnitude spectrum, otherwise the first frame is used
+        """
+        self.alpha_s = alpha_s
+        self.alpha_p = alpha_p
+        self.alpha_d = alpha_d
+        self.delta = delta
+        self.window_frames = window_frames
+        self.count = 0
+
+        self.S = self.S_min = self.S_tmp = self.noise_power = self.p = None
+        if noise_spectrum is not None:
+            self._init(np.asarray(noise_spectrum, dtype=np.float64) ** 2)
+
+    def _init(self, power):
+        self.S = power.copy()
+        self.S_min = power.copy()
+        self.S_tmp = power.copy()
+        self.noise_power = power.copy()
+        self.p = np.zeros_like(power)
+        self.S_f = np.zeros_like(power)                                        # 逐帧复用的工作缓冲
+        self.alpha = np.zeros_like(power)
+        self.power = np.zeros_like(power)
+        self.speech = np.zeros(power.shape, dtype=bool)
+        self.noise = np.sqrt(power)                                            # 当前噪声幅度谱
+
+    def update(self, magnitude):
+        """
+        update with one frame
+        :param magnitude: magnitude spectrum, bins on the last axis (leading axes are channels)
+        :return: noise magnitude spectrum, same shape, the buffer is reused by the next update
+        """
+        magnitude = np.asarray(magnitude, dtype=np.float64)
+        if self.S is None:
+            self._init(magnitude ** 2)
+        power = np.square(magnitude, out=self.power)
+
+        # 频率方向 [0.25, 0.5, 0.25] 平滑, 两端重复边界值
+        S_f = np.multiply(power, 0.5, out=self.S_f)
+        S_f[..., 1:] += 0.25 * power[..., :-1]
+        S_f[..., :-1] += 0.25 * power[..., 1:]
+        S_f[..., 0] += 0.25 * power[..., 0]
+        S_f[..., -1] += 0.25 * power[..., -1]
+        self.S *= self.alpha_s
+        self.S += (1 - self.alpha_s) * S_f
+
+        # 局部最小值跟踪, 每 window_frames 帧重启一次
+        np.minimum(self.S_min, self.S, out=self.S_min)
+        np.minimum(self.S_tmp, self.S, out=self.S_tmp)
+        self.count += 1
+        if self.count % self.window_frames == 0:
+            np.minimum(self.S_tmp, self.S, out=self.S_min)
+            self.S_tmp[...] = self.S
+
+        # 语音存在概率控制噪声谱的平滑系数
+        np.greater(self.S, self.delta * self.S_min, out=self.speech)
+        self.p *= self.alpha_p
+        self.p += (1 - self.alpha_p) * self.speech
+        alpha = np.multiply(self.p, 1 - self.alpha_d, out=self.alpha)
+        alpha += self.alpha_d
+        self.noise_power *= alpha
+        self.noise_power += (1 - alpha) * power
+        return np.sqrt(self.noise_power, out=self.noise)
+
+    def track(self, magnitude):
+        """
+        run over a whole magnitude matrix
+        :param magnitude: magnitude spectrum, shape (..., bins, frames)
+        :return: noise magnitude spectrum of every frame, same shape
+        """
+        magnitude = np.asarray(magnitude, dtype=np.float64)
+        noise = np.zeros_like(magnitude)
+        for i in range(magnitude.shape[-1]):
+            noise[..., i] = self.update(magnitude[..., i])
+        return noise
@@ -0,0 +1,131 @@
+"""
+@FileName: BatchInference.py
+@Description: Implement batched multi-file inference of the IBM / IRM / Mapping enhancement models
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import glob
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import librosa
+import numpy as np
+import soundfile as sf
+from keras.models import load_model
+from basic_functions import stackContext, applyNormalization, loadNormalization
+
+
+def loadFile(path, scale, offset, sr=8000, win_length=256, hop_length=128, nfft=512, left=2, right=2):
+    """
+    decode one file and compute its model input, runs on the reader threads
+    the context is zero padded so every frame gets a mask and the output stays aligned with the input
+    :param path: wav file
+    :param scale: feature scale saved by training
+    :param offset: feature offset saved by training
+    :return: standardized features (frames, context * bins), spectrum (bins, frames), samples
+    """
+    data, _ = librosa.load(path, sr=sr)
+    spectrum = librosa.stft(data, win_length=win_length, hop_length=hop_length, n_fft=nfft)
+    magnitude = np.pad(np.abs(spectrum).T, ((left, right), (0, 0)))
+    feature = applyNormalization(stackContext(magnitude, left, right), scale, offset)
+    return feature, spectrum, len(data)
+
+
+def writeFile(path, spectrum, prediction, length, mode="IBM", sr=8000, win_length=256, hop_length=128, nfft=512):
+    """
+    apply the model output and write the enhanced speech, runs on the writer threads
+    :param path: output wav file
+    :param spectrum: noisy spectrum (bins, frames)
+    :param prediction: model output of the file (frames, bins)
+    :param length: number of input samples
+    :param mode: "IBM", "IRM" or "Mapping"
+    :return:
+    """
+    if mode == "IBM":
+        en_spectrum = spectrum * (prediction.T > 0.5)
+    elif mode == "IRM":
+        en_spectrum = spectrum * prediction.T
+    else:
+        # 预测的是干净幅度谱, 沿用带噪相位
+        en_spectrum = prediction.T * np.exp(1.0j * np.angle(spectrum))
+    frame = librosa.istft(en_spectrum, win_length=win_length, hop_length=hop_length, n_fft=nfft, length=length)
+    sf.write(path, frame, sr)
+
+
+def enhanceFiles(model, paths, output_dir, mode="IBM", norm_path="./model_norm.npz", sr=8000, batch_frames=8192,
+                 readers=4, writers=2):
+    """
+    enhance many files with one loaded model
+    frames of several files are packed into one predict call, the outputs are split back per file
+    :param model: keras model trained by IBM.py, IRM.py or Mapping.py
+    :param paths: input wav files
+    :param output_dir: folder of the enhanced files, same file names as the inputs
+    :param mode: "IBM", "IRM" or "Mapping"
+    :param norm_path: normalization statistics saved by training
+    :param sr: sample rate
+    :param batch_frames: frames gathered before each predict call
+    :param readers: decoding threads
+    :param writers: synthesis and writing threads
+    :return: number of files, seconds of audio, elapsed seconds
+    """
+    if mode not in ("IBM", "IRM", "Mapping"):
+        raise NameError('Unrecongnized mode')
+    os.makedirs(output_dir, exist_ok=True)
+    scale, offset = loadNormalization(norm_path)
+
+    start = time.time()
+    samples_num = 0
+    with ThreadPoolExecutor(readers) as reader, ThreadPoolExecutor(writers) as writer:
+        # 预读的文件数有上限, 内存不随文件数增长
+        pending = deque()
+        paths = iter(paths)
+        for path in paths:
+            pending.append((path, reader.submit(loadFile, path, scale, offset, sr)))
+            if len(pending) >= 2 * readers:
+                break
+
+        written = []
+        batch, rows = [], 0
+        while pending:
+            path, future = pending.popleft()
+            for path_next in paths:
+                pending.append((path_next, reader.submit(loadFile, path_next, scale, offset, sr)))
+                break
+            feature, spectrum, length = future.result()
+            samples_num += length
+            batch.append((path, feature, spectrum, length))
+            rows += len(feature)
+            if rows < batch_frames and pending:
+                continue
+
+            prediction = model.predict(np.concatenate([item[1] for item in batch]), batch_size=1024, verbose=0)
+            splits = np.cumsum([len(item[1]) for item in batch])[:-1]
+            for (path, _, spectrum, length), value in zip(batch, np.split(prediction, splits)):
+                output_path = os.path.join(output_dir, os.path.basename(path))
+                written.append(writer.submit(writeFile, output_path, spectrum, value, length, mode, sr))
+            batch, rows = [], 0
+
+        for future in written:
+            future.result()
+    return len(written), samples_num / sr, time.time() - start
+
+
+if __name__ == "__main__":
+    # python BatchInference.py <input folder> <output folder> [IBM|IRM|Mapping]
+    input_dir = sys.argv[1] if len(sys.argv) > 1 else "./"
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else "./enhanced"
+    mode = sys.argv[3] if len(sys.argv) > 3 else "IBM"
+
+    model = load_model("./model.h5")
+    paths = sorted(glob.glob(os.path.join(input_dir, "*.wav")))
+    files_num, duration, elapsed = enhanceFiles(model, paths, output_dir, mode)
+
+    print('Enhanced %d files, %.1f s of audio in %.2f s' % (files_num, duration, elapsed))
+    print('Files per second: %.2f' % (files_num / elapsed))
+    print('Real-time factor: %.4f' % (elapsed / max(duration, 1e-12)))
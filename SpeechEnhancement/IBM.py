@@ -10,7 +10,7 @@
 
 import numpy as np
 import librosa
-from sklearn.preprocessing import StandardScaler
+from basic_functions import stackContext, fitNormalization, applyNormalization, saveNormalization
 from keras.layers import *
 from keras.models import Sequential
 
@@ -29,13 +29,7 @@ def generateDataset():
     mix_mag = np.abs(mix_spectrum).T
     clean_mag = np.abs(clean_spectrum).T
 
-    frame_num = mix_mag.shape[0] - 4
-    feature = np.zeros([frame_num, 257*5])
-    k = 0
-    for i in range(frame_num - 4):
-        frame = mix_mag[k:k+5]
-        feature[i] = np.reshape(frame, 257*5)
-        k += 1
+    feature = stackContext(mix_mag, 2, 2)
 
     snr = np.divide(clean_mag, mix_mag)
     mask = np.around(snr, 0)
@@ -44,8 +38,10 @@ def generateDataset():
 
     label = mask[2:-2]
 
-    ss = StandardScaler()
-    feature = ss.fit_transform(feature)
+    # 训练集的均值方差与模型一起保存, 推理时直接使用
+    scale, offset = fitNormalization(feature)
+    saveNormalization("./model_norm.npz", scale, offset)
+    feature = applyNormalization(feature, scale, offset)
     return feature, label
 
 
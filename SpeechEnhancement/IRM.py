@@ -10,7 +10,7 @@
 
 import numpy as np
 import librosa
-from sklearn.preprocessing import StandardScaler
+from basic_functions import stackContext, fitNormalization, applyNormalization, saveNormalization
 from keras.layers import *
 from keras.models import Sequential
 
@@ -30,21 +30,17 @@ def generateDataset():
     clean_mag = np.abs(clean_spectrum).T
 
     # 调整输入为5帧
-    frame_num = mix_mag.shape[0] - 4
-    feature = np.zeros([frame_num, 257*5])
-    k = 0
-    for i in range(frame_num - 4):
-        frame = mix_mag[k:k+5]
-        feature[i] = np.reshape(frame, 257*5)
-        k += 1
+    feature = stackContext(mix_mag, 2, 2)
 
     snr = np.divide(clean_mag, mix_mag)
     mask = np.power(np.divide(snr, snr+1), 0.5)
 
     label = mask[2:-2]
 
-    ss = StandardScaler()
-    feature = ss.fit_transform(feature)
+    # 训练集的均值方差与模型一起保存, 推理时直接使用
+    scale, offset = fitNormalization(feature)
+    saveNormalization("./model_norm.npz", scale, offset)
+    feature = applyNormalization(feature, scale, offset)
     return feature, label
 
 
@@ -81,8 +77,6 @@ def train(feature, label, model):
 def main():
     feature, label = generateDataset()
     model = getModel()
-    ss = StandardScaler()
-    feature = ss.fit_transform(feature)
     train(feature, label, model)
 
 
@@ -11,7 +11,6 @@
 import librosa
 from basic_functions import *
 import matplotlib.pyplot as plt
-from sklearn.preprocessing import StandardScaler
 from keras.models import load_model
 
 def show(data, s):
@@ -26,6 +25,7 @@ def show(data, s):
 
 
 model = load_model("./model.h5")
+scale, offset = loadNormalization("./model_norm.npz")
 data, fs = librosa.load("./test.wav", sr=8000)
 
 win_length = 256
@@ -36,16 +36,9 @@ spectrum = librosa.stft(data, win_length=win_length, hop_length=hop_length, n_ff
 magnitude = np.abs(spectrum).T
 phase = np.angle(spectrum).T
 
-frame_num = magnitude.shape[0] - 4
-feature = np.zeros([frame_num, 257 * 5])
-k = 0
-for i in range(frame_num - 4):
-    frame = magnitude[k:k + 5]
-    feature[i] = np.reshape(frame, 257 * 5)
-    k += 1
+feature = stackContext(magnitude, 2, 2)
 
-ss = StandardScaler()
-feature = ss.fit_transform(feature)
+feature = applyNormalization(feature, scale, offset)
 mask = model.predict(feature)
 mask[mask > 0.5] = 1
 mask[mask <= 0.5] = 0
@@ -0,0 +1,236 @@
+"""
+@FileName: StreamingInference.py
+@Description: Implement frame-by-frame streaming inference of the IBM / IRM / Mapping enhancement models
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import sys
+import time
+import librosa
+import numpy as np
+import soundfile as sf
+from keras.models import load_model
+from basic_functions import applyNormalization, loadNormalization
+
+
+class StreamingEnhancer:
+    def __init__(self, model, mode="IBM", win_length=256, hop_length=128, nfft=512, left=2, right=2,
+                 scale=None, offset=None):
+        """
+        the STFT matches librosa.stft(center=True) used for training, so the model sees the same features
+        the output lags the input by self.latency samples: `right` frames of lookahead plus the overlap-add tail
+        :param model: keras model trained by IBM.py, IRM.py or Mapping.py
+        :param mode: "IBM", "IRM" or "Mapping"
+        :param left: frames of left context
+        :param right: frames of right context (lookahead)
+        :param scale: feature scale saved by training, see loadNormalization, no scaling if None
+        :param offset: feature offset saved by training
+        """
+        if mode not in ("IBM", "IRM", "Mapping"):
+            raise NameError('Unrecongnized mode')
+        self.model = model
+        self.mode = mode
+        self.win_length = win_length
+        self.hop_length = hop_length
+        self.nfft = nfft
+        self.left = left
+        self.right = right
+        self.context = left + right + 1
+        self.feature_scale = scale
+        self.feature_offset = offset
+
+        bins = nfft // 2 + 1
+        self.window = np.hanning(win_length + 1)[:-1]                          # 与 librosa 的 hann 窗一致
+        self.offset = (nfft - win_length) // 2                                 # 窗在 nfft 帧中居中
+        self.fft_frame = np.zeros(nfft)
+
+        # 输入环形缓冲, 每个样本写两次, buffer[pos:pos+win] 是最近的 win 个样本
+        self.buffer = np.zeros(2 * win_length)
+        self.pos = 0
+        phase = (win_length // 2) % hop_length
+        self.fill = (hop_length - phase) % hop_length                          # 第一帧在收到 win/2 个样本时完成
+
+        # 幅度谱与复数谱的环形缓冲, 同样写两次, 上下文总是连续的 context 行
+        self.magnitude = np.zeros((2 * self.context, bins))
+        self.spectrum = np.zeros((2 * self.context, bins), dtype=np.complex128)
+        self.row = 0
+        self.frames_count = 0
+        self.samples_count = 0
+
+        # 交叠相加, R 个 hop 长度的块循环使用; 窗函数平方和随帧累加, 流的两端与 librosa.istft 的归一化一致
+        self.R = -(-win_length // hop_length)
+        self.ola = np.zeros((self.R, hop_length))
+        self.ola_weight = np.zeros((self.R, hop_length))
+        self.weights = np.pad(self.window ** 2, (0, self.R * hop_length - win_length)).reshape(self.R, hop_length)
+        self.out_frame = np.zeros(self.R * hop_length)
+        self.synthesized = 0
+        self.skip = win_length // 2                                            # 信号开始之前的输出样本
+
+    @property
+    def latency(self):
+        """
+        algorithmic delay in samples
+        """
+        return self.right * self.hop_length + self.win_length - self.hop_length
+
+    def _write(self, piece):
+        W = self.win_length
+        n = len(piece)
+        first = min(n, W - self.pos)
+        self.buffer[self.pos:self.pos + first] = piece[:first]
+        self.buffer[self.pos + W:self.pos + W + first] = piece[:first]
+        self.buffer[:n - first] = piece[first:]
+        self.buffer[W:W + n - first] = piece[first:]
+        self.pos = (self.pos + n) % W
+
+    def _analyze(self):
+        """
+        transform the newest frame into the context rings
+        :return: context features and spectrum of the frame that now has its full lookahead, None before that
+        """
+        win = self.win_length
+        self.fft_frame[self.offset:self.offset + win] = self.buffer[self.pos:self.pos + win] * self.window
+        return self._push(np.fft.rfft(self.fft_frame))
+
+    def _push(self, spectrum):
+        """
+        append one frame to the context rings
+        :param spectrum: complex spectrum of the frame
+        :return: context features and spectrum of the frame that now has its full lookahead, None before that
+        """
+        C = self.context
+        row = self.row
+        self.spectrum[row] = self.spectrum[row + C] = spectrum
+        self.magnitude[row] = self.magnitude[row + C] = np.abs(spectrum)
+        self.row = (row + 1) % C
+        self.frames_count += 1
+        if self.frames_count <= self.right:
+            return None
+
+        # 最旧的 context 帧在 row 处, 中心帧是第 left 行; 同一块内后续帧会覆盖环形缓冲, 所以复制
+        feature = self.magnitude[self.row:self.row + C].reshape(-1).copy()
+        return feature, self.spectrum[self.row + self.left].copy()
+
+    def _synthesize(self, spectrum, output):
+        """
+        overlap-add one enhanced frame and append the finished hop to output
+        :param spectrum: enhanced spectrum, None for a frame past the end of the input that adds nothing
+        """
+        hop, win = self.hop_length, self.win_length
+        c = self.synthesized
+        if spectrum is not None:
+            frame = np.fft.irfft(spectrum, self.nfft)[self.offset:self.offset + win]
+            self.out_frame[:win] = frame * self.window
+            for r in range(self.R):
+                self.ola[(c + r) % self.R] += self.out_frame[r * hop:(r + 1) * hop]
+                self.ola_weight[(c + r) % self.R] += self.weights[r]
+        block, weight = self.ola[c % self.R], self.ola_weight[c % self.R]
+        finished = block / np.maximum(weight, 1e-8)
+        block[:] = 0
+        weight[:] = 0
+        self.synthesized += 1
+
+        drop = min(self.skip, hop)
+        self.skip -= drop
+        output.append(finished[drop:])
+
+    def _enhance(self, features, spectra, output):
+        """
+        predict the masks of the ready frames in one batch and synthesize them
+        """
+        batch = np.stack(features)
+        if self.feature_scale is not None:
+            applyNormalization(batch, self.feature_scale, self.feature_offset, out=batch)
+        prediction = np.asarray(self.model.predict_on_batch(batch))
+        if self.mode == "IBM":
+            prediction = (prediction > 0.5).astype(np.float64)
+
+        for spectrum, value in zip(spectra, prediction):
+            if self.mode == "Mapping":
+                # 预测的是干净幅度谱, 沿用带噪相位
+                value = value / np.maximum(np.abs(spectrum), 1e-12)
+            self._synthesize(spectrum * value, output)
+
+    def process(self, chunk):
+        """
+        :param chunk: PCM samples, usually one hop
+        :return: enhanced samples finished by this chunk, sample n of the stream is output sample n,
+                 it is returned self.latency samples after the input sample n arrives
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        hop = self.hop_length
+        self.samples_count += len(chunk)
+        features, spectra = [], []
+
+        k = 0
+        while k < len(chunk):
+            n = min(hop - self.fill, len(chunk) - k)
+            self._write(chunk[k:k + n])
+            self.fill += n
+            k += n
+            if self.fill == hop:
+                self.fill = 0
+                ready = self._analyze()
+                if ready is not None:
+                    features.append(ready[0])
+                    spectra.append(ready[1])
+
+        output = []
+        if features:
+            # 本块内完成的所有帧组成一个小批次
+            self._enhance(features, spectra, output)
+        return np.concatenate(output) if output else np.zeros(0)
+
+    def flush(self):
+        """
+        end the stream the way offline processing does: zero samples complete the frames that still cover the input,
+        the lookahead of the last frames is zero context rows, and frames past the input add nothing to the overlap-add
+        :return: remaining samples, the whole output then has exactly the input length
+        """
+        hop, length = self.hop_length, self.samples_count
+        frames_num = 1 + length // hop                                         # librosa.stft(center=True) 的帧数
+        needed = self.win_length // 2 + (frames_num - 1) * hop - length
+        output = [self.process(np.zeros(max(needed, 0)))]
+
+        # 输入之后的上下文帧为零, 与离线处理两端补零一致
+        features, spectra = [], []
+        zeros = np.zeros(self.nfft // 2 + 1, dtype=np.complex128)
+        for _ in range(self.right):
+            ready = self._push(zeros)
+            if ready is not None:
+                features.append(ready[0])
+                spectra.append(ready[1])
+        if features:
+            self._enhance(features, spectra, output)
+
+        # 剩余的交叠相加尾部, 超出输入长度的样本丢弃
+        while self.synthesized * hop - self.win_length // 2 < length:
+            self._synthesize(None, output)
+        tail = np.concatenate(output)
+        return tail[:len(tail) - (self.synthesized * hop - self.win_length // 2 - length)]
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "IBM"
+    model = load_model("./model.h5")
+    scale, offset = loadNormalization("./model_norm.npz", np.float64)
+    data, fs = librosa.load("./test.wav", sr=8000)
+
+    enhancer = StreamingEnhancer(model, mode, scale=scale, offset=offset)
+    hop = enhancer.hop_length
+    output = []
+
+    start = time.time()
+    for k in range(0, len(data), hop):
+        output.append(enhancer.process(data[k:k + hop]))
+    output.append(enhancer.flush())
+    end = time.time()
+
+    output = np.concatenate(output)
+    print('Latency of streaming enhancement: %d samples' % enhancer.latency)
+    print('Real-time factor of streaming enhancement: %.4f' % ((end - start) / (len(data) / fs)))
+    sf.write("./streaming_output.wav", output, fs)
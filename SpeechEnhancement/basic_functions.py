@@ -38,7 +38,7 @@ def normalization(data):
 def preEmphasis(samples, fs, alpha=0.9375, overlapping=0, window_length=240, window_type='Rectangle', display=False):
     """
     per emphasis speech
-    :param samples: sample data
+    :param samples: sample data, shape (samples,) or (channels, samples)
     :param fs: sample frequency
     :param alpha: parameter
     :param overlapping: overlapping length
@@ -47,16 +47,11 @@ def preEmphasis(samples, fs, alpha=0.9375, overlapping=0, window_length=240, win
     :param display: whether to display processed speech
     :return: processed speech
     """
-    y = np.zeros(len(samples))
-    y[0] = samples[0]
-
-    # pre emphasis
-    for i in range(1, len(samples)):
-        y[i] = samples[i] - alpha * samples[i-1]
+    y = PreEmphasisFilter(alpha).process(samples)
 
     if display:
-        time = np.arange(0, len(samples)) * (1.0 / fs)
-        plt.plot(time, samples)
+        time = np.arange(0, np.shape(samples)[-1]) * (1.0 / fs)
+        plt.plot(time, np.transpose(samples))
         plt.title("Pre-emphasis")
         plt.ylabel("Waveform")
         plt.xlabel("Time (seconds)")
@@ -65,6 +60,123 @@ def preEmphasis(samples, fs, alpha=0.9375, overlapping=0, window_length=240, win
     return y
 
 
+def deEmphasis(samples, alpha=0.9375):
+    """
+    de emphasis, the exact inverse of preEmphasis
+    :param samples: pre-emphasized data, shape (samples,) or (channels, samples)
+    :param alpha: parameter
+    :return: restored speech
+    """
+    return DeEmphasisFilter(alpha).process(samples)
+
+
+class PreEmphasisFilter:
+    def __init__(self, alpha=0.9375):
+        """
+        streaming pre emphasis y[n] = x[n] - alpha * x[n-1], the last input sample is carried across chunks
+        :param alpha: parameter
+        """
+        self.b = np.array([1.0, -alpha])
+        self.a = np.array([1.0])
+        self.zi = None
+
+    def process(self, chunk):
+        """
+        :param chunk: data, shape (samples,) or (channels, samples)
+        :return: filtered chunk
+        """
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if self.zi is None:
+            self.zi = np.zeros(chunk.shape[:-1] + (1,))
+        y, self.zi = signal.lfilter(self.b, self.a, chunk, axis=-1, zi=self.zi)
+        return y
+
+    def reset(self):
+        self.zi = None
+
+
+class DeEmphasisFilter(PreEmphasisFilter):
+    def __init__(self, alpha=0.9375):
+        """
+        streaming de emphasis y[n] = x[n] + alpha * y[n-1], the last output sample is carried across chunks
+        :param alpha: parameter
+        """
+        super().__init__(alpha)
+        self.b, self.a = self.a, self.b
+
+
+def stackContext(features, left=2, right=2, pad=False):
+    """
+    stack every frame with its left and right neighbours, row i is features[i:i+left+right+1] flattened
+    consecutive rows of a C-contiguous matrix are adjacent in memory, so the result is a strided view
+    :param features: frame features, shape (frames, dim)
+    :param left: frames of left context
+    :param right: frames of right context
+    :param pad: repeat the edge frames so that every input frame gets a row
+    :return: read-only array, shape (frames - left - right, (left + right + 1) * dim), or (frames, ...) if pad
+    """
+    features = np.ascontiguousarray(features)
+    if pad:
+        features = np.pad(features, ((left, right), (0, 0)), mode='edge')
+    frames, dim = features.shape
+    context = left + right + 1
+    frames_num = max(frames - context + 1, 0)
+    itemsize = features.itemsize
+    return np.lib.stride_tricks.as_strided(features, shape=(frames_num, context * dim),
+                                           strides=(dim * itemsize, itemsize), writeable=False)
+
+
+def fitNormalization(feature):
+    """
+    per-dimension standardization fitted on the training features, same statistics as StandardScaler
+    :param feature: training features, shape (frames, dim)
+    :return: scale = 1 / std and offset = -mean / std, so that feature * scale + offset is standardized
+    """
+    mean = np.mean(feature, axis=0, dtype=np.float64)
+    std = np.std(feature, axis=0, dtype=np.float64)
+    std[std == 0] = 1                                                          # 常数维度不缩放
+    scale = 1.0 / std
+    return scale, -mean * scale
+
+
+def applyNormalization(feature, scale, offset, out=None):
+    """
+    feature * scale + offset with one output buffer and no temporaries
+    :param feature: features, shape (..., dim)
+    :param scale: from fitNormalization or loadNormalization
+    :param offset: from fitNormalization or loadNormalization
+    :param out: output array, may be feature itself if it is writeable
+    :return: standardized features, dtype of feature if it is floating
+    """
+    if out is None:
+        dtype = feature.dtype if np.issubdtype(feature.dtype, np.floating) else np.float64
+        out = np.empty(feature.shape, dtype=dtype)
+    np.multiply(feature, scale, out=out, casting='same_kind')
+    np.add(out, offset, out=out, casting='same_kind')
+    return out
+
+
+def saveNormalization(path, scale, offset):
+    """
+    save the statistics next to the model, e.g. ./model_norm.npz for ./model.h5
+    :param path: npz file
+    :param scale: from fitNormalization
+    :param offset: from fitNormalization
+    :return:
+    """
+    np.savez(path, scale=scale, offset=offset)
+
+
+def loadNormalization(path, dtype=np.float32):
+    """
+    :param path: npz file written by saveNormalization
+    :param dtype: dtype of the features they are applied to
+    :return: scale, offset
+    """
+    with np.load(path) as f:
+        return f["scale"].astype(dtype), f["offset"].astype(dtype)
+
+
 def displaySpeech(samples, fs):
     """
     display waveform of a given speech sample
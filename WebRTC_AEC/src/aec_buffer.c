@@ -0,0 +1,86 @@
+//============================================================================
+// Name        : aec_buffer.c
+// Author      : Ryuk
+// Version     : 0.1.0
+// Description : Whole-buffer helpers for the Python bindings, the 10 ms
+//               frame loop runs in C on caller-owned buffers
+//============================================================================
+
+#include <stddef.h>
+#include <stdint.h>
+#include "echo_cancellation.h"
+
+#define MAX_FRAME 160
+
+static int16_t FloatToS16(float v)
+{
+    float s = v * 32768.0f;
+    if (s >= 32767.0f) return 32767;
+    if (s <= -32768.0f) return -32768;
+    return (int16_t)(s >= 0 ? s + 0.5f : s - 0.5f);
+}
+
+// Process length samples of int16 audio frame by frame.
+// Returns the number of samples written to out, -1 on error.
+int32_t WebRtcAec_ProcessBuffer(void* aecInst,
+                                const int16_t* farend,
+                                const int16_t* nearend,
+                                int16_t* out,
+                                int32_t length,
+                                int16_t frameSize,
+                                int16_t msInSndCardBuf,
+                                int32_t skew)
+{
+    int32_t i;
+
+    if (frameSize != 80 && frameSize != 160) {
+        return -1;
+    }
+    for (i = 0; i + frameSize <= length; i += frameSize) {
+        if (WebRtcAec_BufferFarend(aecInst, farend + i, frameSize) != 0) {
+            return -1;
+        }
+        if (WebRtcAec_Process(aecInst, nearend + i, NULL, out + i, NULL,
+                              frameSize, msInSndCardBuf, skew) != 0) {
+            return -1;
+        }
+    }
+    return i;
+}
+
+// Same as WebRtcAec_ProcessBuffer for float audio in [-1, 1), converted
+// per frame on the stack so the caller never makes an int16 copy.
+int32_t WebRtcAec_ProcessBufferFloat(void* aecInst,
+                                     const float* farend,
+                                     const float* nearend,
+                                     float* out,
+                                     int32_t length,
+                                     int16_t frameSize,
+                                     int16_t msInSndCardBuf,
+                                     int32_t skew)
+{
+    int16_t far_frame[MAX_FRAME], near_frame[MAX_FRAME], out_frame[MAX_FRAME];
+    int32_t i;
+    int k;
+
+    if (frameSize != 80 && frameSize != 160) {
+        return -1;
+    }
+    for (i = 0; i + frameSize <= length; i += frameSize) {
+        for (k = 0; k < frameSize; k++) {
+            far_frame[k] = FloatToS16(farend[i + k]);
+            near_frame[k] = FloatToS16(nearend[i + k]);
+        }
+        if (WebRtcAec_BufferFarend(aecInst, far_frame, frameSize) != 0) {
+            return -1;
+        }
+        if (WebRtcAec_Process(aecInst, near_frame, NULL, out_frame, NULL,
+                              frameSize, msInSndCardBuf, skew) != 0) {
+            return -1;
+        }
+        for (k = 0; k < frameSize; k++) {
+            out[i + k] = out_frame[k] / 32768.0f;
+        }
+    }
+    return i;
+}
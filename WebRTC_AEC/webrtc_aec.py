@@ -0,0 +1,212 @@
+"""
+@FileName: webrtc_aec.py
+@Description: Implement ctypes bindings of the WebRTC AEC in src, NumPy buffers are passed without copying
+@Author: Ryuk
+@CreateDate: 2026/10/17
+@LastEditTime: 2026/10/17
+@LastEditors: Please set LastEditors
+@Version: v0.1
+"""
+
+import os
+import sys
+import time
+import ctypes
+import subprocess
+import numpy as np
+import soundfile as sf
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LIB_PATH = os.path.join(ROOT, "bin", "libwebrtc_aec.so")
+
+# echo_cancellation.h 中的枚举
+kAecNlpConservative = 0
+kAecNlpModerate = 1
+kAecNlpAggressive = 2
+
+
+class AecConfig(ctypes.Structure):
+    _fields_ = [("nlpMode", ctypes.c_int16),
+                ("skewMode", ctypes.c_int16),
+                ("metricsMode", ctypes.c_int16),
+                ("delay_logging", ctypes.c_int)]
+
+
+def loadLibrary(path=LIB_PATH):
+    """
+    load the shared library, build it with `make lib` the first time
+    :param path: library path
+    :return: ctypes library with typed signatures
+    """
+    if not os.path.exists(path):
+        subprocess.run(["make", "lib"], cwd=ROOT, check=True)
+    lib = ctypes.CDLL(path)
+
+    i16p = ctypes.POINTER(ctypes.c_int16)
+    f32p = ctypes.POINTER(ctypes.c_float)
+    signatures = {
+        "WebRtcAec_Create": [ctypes.POINTER(ctypes.c_void_p)],
+        "WebRtcAec_Free": [ctypes.c_void_p],
+        "WebRtcAec_Init": [ctypes.c_void_p, ctypes.c_int32, ctypes.c_int32],
+        "WebRtcAec_set_config": [ctypes.c_void_p, AecConfig],
+        "WebRtcAec_get_error_code": [ctypes.c_void_p],
+        "WebRtcAec_BufferFarend": [ctypes.c_void_p, i16p, ctypes.c_int16],
+        "WebRtcAec_Process": [ctypes.c_void_p, i16p, i16p, i16p, i16p,
+                              ctypes.c_int16, ctypes.c_int16, ctypes.c_int32],
+        "WebRtcAec_ProcessBuffer": [ctypes.c_void_p, i16p, i16p, i16p,
+                                    ctypes.c_int32, ctypes.c_int16, ctypes.c_int16, ctypes.c_int32],
+        "WebRtcAec_ProcessBufferFloat": [ctypes.c_void_p, f32p, f32p, f32p,
+                                         ctypes.c_int32, ctypes.c_int16, ctypes.c_int16, ctypes.c_int32],
+    }
+    for name, argtypes in signatures.items():
+        func = getattr(lib, name)
+        func.argtypes = argtypes
+        func.restype = ctypes.c_int32
+    return lib
+
+
+def _buffer(x, dtype):
+    """
+    C-contiguous view of x, only copies when the dtype or layout does not match
+    """
+    x = np.ascontiguousarray(x, dtype=dtype)
+    ctype = ctypes.c_int16 if dtype == np.int16 else ctypes.c_float
+    return x, x.ctypes.data_as(ctypes.POINTER(ctype))
+
+
+def _output(out, length, dtype):
+    """
+    pointer to a caller supplied output buffer, which is never copied, so the C code writes into it
+    """
+    if not isinstance(out, np.ndarray) or out.dtype != dtype:
+        raise ValueError("out must be an array of dtype %s" % np.dtype(dtype).name)
+    if not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError("out must be a writeable C-contiguous array")
+    if out.ndim != 1 or len(out) < length:
+        raise ValueError("out must be a 1-D array of at least %d samples" % length)
+    return _buffer(out, dtype)
+
+
+class WebRtcAec:
+    _lib = None
+
+    def __init__(self, sr=16000, nlp_mode=kAecNlpAggressive, ms_in_snd_card_buf=40, skew=0):
+        """
+        :param sr: sample rate, 8000 or 16000
+        :param nlp_mode: kAecNlpConservative, kAecNlpModerate or kAecNlpAggressive
+        :param ms_in_snd_card_buf: delay of the sound card and system buffers in ms
+        :param skew: clock skew between playout and capture
+        """
+        self.handle = ctypes.c_void_p()                              # 先置空, 加载失败时 close() 也安全
+        if WebRtcAec._lib is None:
+            WebRtcAec._lib = loadLibrary()
+        self.lib = WebRtcAec._lib
+        self.sr = sr
+        self.frame_size = sr // 100                                  # 10 ms
+        self.ms_in_snd_card_buf = ms_in_snd_card_buf
+        self.skew = skew
+
+        self._check(self.lib.WebRtcAec_Create(ctypes.byref(self.handle)), "Create")
+        self.init()
+        self.setConfig(nlp_mode)
+
+    def _check(self, ret, name):
+        if ret != 0:
+            code = self.lib.WebRtcAec_get_error_code(self.handle) if self.handle else ret
+            raise RuntimeError("WebRtcAec_%s failed with error %d" % (name, code))
+
+    def init(self):
+        """
+        reset the canceller
+        :return:
+        """
+        self._check(self.lib.WebRtcAec_Init(self.handle, self.sr, self.sr), "Init")
+
+    def setConfig(self, nlp_mode=kAecNlpModerate, skew_mode=0, metrics_mode=0, delay_logging=0):
+        config = AecConfig(nlp_mode, skew_mode, metrics_mode, delay_logging)
+        self._check(self.lib.WebRtcAec_set_config(self.handle, config), "set_config")
+
+    def bufferFarend(self, far_frame):
+        """
+        :param far_frame: one 10 ms int16 far-end frame
+        :return:
+        """
+        far_frame, far_ptr = _buffer(far_frame, np.int16)
+        self._check(self.lib.WebRtcAec_BufferFarend(self.handle, far_ptr, len(far_frame)), "BufferFarend")
+
+    def process(self, near_frame, out=None):
+        """
+        :param near_frame: one 10 ms int16 microphone frame
+        :param out: optional int16 C-contiguous output frame, written in place
+        :return: echo cancelled frame
+        """
+        near_frame, near_ptr = _buffer(near_frame, np.int16)
+        if out is None:
+            out = np.empty(len(near_frame), dtype=np.int16)
+        out, out_ptr = _output(out, len(near_frame), np.int16)
+        self._check(self.lib.WebRtcAec_Process(self.handle, near_ptr, None, out_ptr, None, len(near_frame),
+                                               self.ms_in_snd_card_buf, self.skew), "Process")
+        return out
+
+    def processFile(self, far, near, out=None):
+        """
+        cancel echo for whole signals in one call, the 10 ms frame loop runs in C
+        :param far: far-end signal, int16 or float32 in [-1, 1)
+        :param near: microphone signal, same dtype as far
+        :param out: optional C-contiguous output of the processing dtype (int16 or float32), written in place
+        :return: echo cancelled signal, the trailing partial frame is left as zeros
+        """
+        far, near = np.asarray(far), np.asarray(near)
+        if far.dtype != near.dtype:
+            # int16 与浮点的幅度范围不同, 不能直接转换
+            raise ValueError("far and near must have the same dtype, got %s and %s" % (far.dtype, near.dtype))
+        dtype = np.int16 if near.dtype == np.int16 else np.float32
+        far, far_ptr = _buffer(far, dtype)
+        near, near_ptr = _buffer(near, dtype)
+        length = min(len(far), len(near))
+        if out is None:
+            out = np.zeros(length, dtype=dtype)
+        out, out_ptr = _output(out, length, dtype)
+
+        func = self.lib.WebRtcAec_ProcessBuffer if dtype == np.int16 else self.lib.WebRtcAec_ProcessBufferFloat
+        ret = func(self.handle, far_ptr, near_ptr, out_ptr, length, self.frame_size,
+                   self.ms_in_snd_card_buf, self.skew)
+        if ret < 0:
+            self._check(ret, "ProcessBuffer")
+        return out
+
+    def close(self):
+        if self.handle:
+            self.lib.WebRtcAec_Free(self.handle)
+            self.handle = ctypes.c_void_p()
+
+    def __del__(self):
+        self.close()
+
+
+if __name__ == "__main__":
+    path = os.path.join(ROOT, "sample")
+    far, sr = sf.read(os.path.join(path, "far.wav"), dtype="int16")
+    near, sr = sf.read(os.path.join(path, "near.wav"), dtype="int16")
+
+    aec = WebRtcAec(sr)
+    start = time.time()
+    e = aec.processFile(far, near)
+    end = time.time()
+
+    duration = len(e) / sr
+    print('Running time of WebRTC AEC: %s Seconds' % (end - start))
+    print('Real-time factor of WebRTC AEC: %.4f' % ((end - start) / duration))
+
+    # 与逐帧调用的结果一致
+    if len(sys.argv) > 1 and sys.argv[1] == "check":
+        aec.init()
+        aec.setConfig(kAecNlpAggressive)
+        n = aec.frame_size
+        frames = np.zeros_like(e)
+        for k in range(0, len(e) - n + 1, n):
+            aec.bufferFarend(far[k:k + n])
+            aec.process(near[k:k + n], frames[k:k + n])
+        print('Max difference of frame-wise processing: %d' % np.max(np.abs(frames.astype(np.int32) - e)))
+
+    sf.write(os.path.join(path, "webrtc_aec_out.wav"), e, sr)